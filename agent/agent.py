@@ -85,8 +85,9 @@ def make_agent(
     retries: int = 1,
     max_running: int = 4,
     max_queued: int = 8,
+    mcp_headers: dict[str, str] | None = None,
 ) -> Agent:
-    mcp_server = MCPServerStreamableHTTP(mcp_url)
+    mcp_server = MCPServerStreamableHTTP(mcp_url, headers=mcp_headers)
     model = OpenAIResponsesModel(
         model_name="openai/gpt-oss-120b",
         provider=OpenAIProvider(base_url=llm_url, api_key="NONE"),
@@ -0,0 +1,215 @@
+"""
+Replays a file of queries (e.g. the 6011 GDC-QAG evaluation queries) through the agent with a number of
+concurrent sessions, recording per query wall time, tool calls, GDC requests and case cache hit rates,
+and writes them to a parquet file for analysis.
+
+    python agent/replay.py queries.csv -o results.parquet --mcp-url "http://localhost:8001/mcp" --llm-url "http://localhost:8000/v1" -c 8
+
+Each query runs in its own MCP session, whose requests carry a tag of the query (see `QUERY_TAG_HEADER`),
+and its GDC requests and cache hits are read from the MCP server's counters for that tag in /stats.
+The totals over the whole run are printed as well.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Callable
+
+import httpx
+import pandas as pd
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from tqdm import tqdm
+
+from agent import make_agent
+
+# the header the MCP server attributes tool calls to queries by, see qag_mcp/_metrics.py
+QUERY_TAG_HEADER = "x-query-tag"
+
+
+def read_queries(path: str, column: str) -> list[str]:
+    if path.endswith(".jsonl"):
+        df = pd.read_json(path, lines=True)
+    elif path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    elif path.endswith(".tsv"):
+        df = pd.read_csv(path, sep="\t")
+    else:
+        df = pd.read_csv(path)
+    return df[column].tolist()
+
+
+def count_gdc_requests(stats: dict[str, Any]) -> int:
+    # responses replayed from a recording (see --gdc-replay) stand in for GDC requests
+    replayed = (stats.get("gdc_recording") or {}).get("replayed", 0)
+    return stats["gdc_connections"]["requests"] + replayed
+
+
+def count_cache_lookups(stats: dict[str, Any]) -> tuple[int, int]:
+    # hits served from the store count as hits, they didn't need the GDC
+    case_cache = stats["case_cache"]
+    return case_cache["hits"] + case_cache["store_hits"], case_cache["misses"]
+
+
+class Replay:
+    def __init__(
+        self,
+        make_agent: Callable[[dict[str, str]], Agent],
+        stats_url: str,
+        concurrency: int,
+    ):
+        # makes an agent whose MCP requests carry the given headers
+        self.make_agent = make_agent
+        self.stats_url = stats_url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient()
+        # tags are unique per run, so runs against the same server don't mix their counters
+        self.run_id = uuid.uuid4().hex[:8]
+        # the peak number of concurrent queries seen by each query in flight
+        self.in_flight: list[dict[str, int]] = []
+
+    async def get_server_stats(self, query_tag: str | None = None) -> dict[str, Any]:
+        params = {} if query_tag is None else {"query_tag": query_tag}
+        response = await self.client.get(self.stats_url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def run_query(self, i: int, query: str) -> dict[str, Any]:
+        tag = f"{self.run_id}-{i}"
+        async with self.semaphore:
+            concurrent = {"peak": 0}
+            self.in_flight.append(concurrent)
+            for other in self.in_flight:
+                other["peak"] = max(other["peak"], len(self.in_flight))
+            start = time.perf_counter()
+            result = None
+            error = None
+            try:
+                # a separate agent per query, as the MCP session (and its headers) is shared by the runs of an agent
+                async with self.make_agent({QUERY_TAG_HEADER: tag}) as agent:
+                    result = await agent.run(query)
+            except Exception as e:
+                # keep going, a failed query is a data point too
+                error = repr(e)
+            wall_time = time.perf_counter() - start
+            self.in_flight.remove(concurrent)
+
+        tool_names = []
+        usage = None
+        if result is not None:
+            tool_names = [
+                part.tool_name
+                for message in result.all_messages()
+                if isinstance(message, ModelResponse)
+                for part in message.parts
+                if isinstance(part, ToolCallPart)
+            ]
+            usage = result.usage()
+
+        counts = (await self.get_server_stats(query_tag=tag))["query"]
+        # hits served from the store count as hits, they didn't need the GDC
+        cache_hits = counts.get("case_cache_hits", 0) + counts.get(
+            "case_cache_store_hits", 0
+        )
+        cache_misses = counts.get("case_cache_misses", 0)
+        return {
+            "query_index": i,
+            "query": query,
+            "output": None if result is None else str(result.output),
+            "error": error,
+            "wall_time_s": wall_time,
+            "max_concurrent_queries": concurrent["peak"],
+            "model_requests": None if usage is None else usage.requests,
+            "input_tokens": None if usage is None else usage.input_tokens,
+            "output_tokens": None if usage is None else usage.output_tokens,
+            "tool_calls": len(tool_names),
+            "tool_names": tool_names,
+            "gdc_requests": counts.get("gdc_requests", 0),
+            "case_cache_hits": cache_hits,
+            "case_cache_misses": cache_misses,
+            "case_cache_hit_rate": (
+                cache_hits / (cache_hits + cache_misses)
+                if cache_hits or cache_misses
+                else None
+            ),
+        }
+
+    async def run(self, queries: list[tuple[int, str]]) -> list[dict[str, Any]]:
+        records = []
+        with tqdm(total=len(queries)) as progress:
+            for record in asyncio.as_completed(
+                [self.run_query(i, query) for i, query in queries]
+            ):
+                records.append(await record)
+                progress.update()
+        return sorted(records, key=lambda r: r["query_index"])
+
+
+async def main(args: argparse.Namespace):
+    queries = read_queries(args.queries, args.query_column)
+    queries = list(enumerate(queries))[args.offset :]
+    if args.limit is not None:
+        queries = queries[: args.limit]
+
+    stats_url = args.stats_url or str(httpx.URL(args.mcp_url).copy_with(path="/stats"))
+
+    replay = Replay(
+        lambda mcp_headers: make_agent(
+            mcp_url=args.mcp_url, llm_url=args.llm_url, mcp_headers=mcp_headers
+        ),
+        stats_url,
+        args.concurrency,
+    )
+    before = await replay.get_server_stats()
+    start = time.perf_counter()
+    records = await replay.run(queries)
+    elapsed = time.perf_counter() - start
+    after = await replay.get_server_stats()
+    await replay.client.aclose()
+
+    df = pd.DataFrame.from_records(records)
+    df.to_parquet(args.output, index=False)
+
+    print(
+        f"{len(df)} queries in {elapsed:.1f}s ({len(df) / elapsed:.2f} queries/s) with {args.concurrency} sessions, "
+        f"{df['error'].notna().sum()} failed"
+    )
+    # totals over the whole run, from the global counters
+    hits_before, misses_before = count_cache_lookups(before)
+    hits_after, misses_after = count_cache_lookups(after)
+    cache_lookups = hits_after - hits_before + misses_after - misses_before
+    print(
+        f"wall time p50 {df['wall_time_s'].quantile(0.5):.1f}s, p95 {df['wall_time_s'].quantile(0.95):.1f}s, "
+        f"mean tool calls {df['tool_calls'].mean():.1f}, "
+        f"GDC requests {count_gdc_requests(after) - count_gdc_requests(before)}, "
+        f"case cache hit rate {(hits_after - hits_before) / max(cache_lookups, 1):.1%}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "queries", help="CSV, TSV, JSON lines or parquet file of queries."
+    )
+    parser.add_argument("--query-column", default="query")
+    parser.add_argument(
+        "-o", "--output", required=True, help="Parquet file to write the results to."
+    )
+    parser.add_argument("--mcp-url", required=True)
+    parser.add_argument("--llm-url", required=True)
+    parser.add_argument(
+        "--stats-url",
+        default=None,
+        help="Stats endpoint of the MCP server, by default /stats on the host of --mcp-url.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of queries run concurrently, each in its own agent session.",
+    )
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""
+Throughput of parsing case set IDs, on IDs of increasingly deeply nested set operations.
+
+    python -m benchmarks.case_set_ids --depths 1 4 16 64
+"""
+
+import argparse
+import random
+import timeit
+
+from qag_mcp._defines import TOOL_CACHE_ID_TEMPLATES
+from qag_mcp._utils import (
+    SET_OPERATION_TOOLS,
+    CaseSetIdMatcher,
+    canonicalize_case_set_id,
+    extract_top_level_params,
+    match_case_set_id,
+    nest_set_operation,
+)
+
+LEAVES = [
+    "Cases-SSM-(BRAF)-(V600E)",
+    "Cases-SSM-(KRAS)-(None)",
+    "Cases-CNV-(ERBB2)-(amplification)",
+    "Cases-MSI-(msi)",
+    "Cases-Project-(TCGA-BRCA)",
+    "Cases-Cohort-(cases of non-smoking patients)",
+]
+
+
+def match_template_and_params_linear(
+    identifier: str, templates: dict[str, str]
+) -> tuple[str, dict[str, str]] | None:
+    # the previous implementation, kept as the baseline: a linear scan over the templates
+    # followed by two character by character paren scans
+    for func_name, template in templates.items():
+        prefix = template.split("-(")[0]
+        if identifier.startswith(prefix):
+            params = extract_top_level_params(identifier)
+            names = extract_top_level_params(template)
+            if len(params) != len(names):
+                raise ValueError
+            return (func_name, {n.strip("{}"): p for n, p in zip(names, params)})
+    return None
+
+
+def canonicalize_case_set_id_linear(case_set_id: str) -> str:
+    # the previous implementation, re-matching every operand at every level of nesting
+    try:
+        match = match_template_and_params_linear(case_set_id, TOOL_CACHE_ID_TEMPLATES)
+    except (ValueError, IndexError):
+        return case_set_id
+    if match is None or match[0] not in SET_OPERATION_TOOLS:
+        return case_set_id
+
+    tool_name = match[0]
+    operands = set()
+    stack = list(match[1].values())
+    while stack:
+        operand = canonicalize_case_set_id_linear(stack.pop())
+        operand_match = match_template_and_params_linear(
+            operand, TOOL_CACHE_ID_TEMPLATES
+        )
+        if operand_match is not None and operand_match[0] == tool_name:
+            stack.extend(operand_match[1].values())
+        else:
+            operands.add(operand)
+
+    return nest_set_operation(tool_name, sorted(operands))
+
+
+def make_nested_case_set_id(depth: int, rng: random.Random) -> str:
+    # alternate intersections and unions so canonicalization can't flatten the nesting away
+    case_set_id = rng.choice(LEAVES)
+    for i in range(depth):
+        tool_name = "compute_case_intersection" if i % 2 else "compute_case_union"
+        case_set_id = nest_set_operation(tool_name, [case_set_id, rng.choice(LEAVES)])
+    return case_set_id
+
+
+def canonicalize_cold(case_set_id: str) -> str:
+    # without any previously parsed or canonicalized operands to reuse
+    canonicalize_case_set_id.cache_clear()
+    match_case_set_id.cache_clear()
+    return canonicalize_case_set_id(case_set_id)
+
+
+def throughput(fn, number: int) -> float:
+    return number / min(timeit.repeat(fn, number=number, repeat=5))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # uncached, so every call actually parses the ID
+    matcher = CaseSetIdMatcher(TOOL_CACHE_ID_TEMPLATES)
+    print(
+        f"{'depth':>5} {'id chars':>8} {'linear match/s':>15} {'compiled match/s':>17} {'speedup':>8} {'linear canonicalize/s':>21} {'canonicalize cold/s':>19} {'canonicalize warm/s':>19}"
+    )
+    for depth in args.depths:
+        case_set_id = make_nested_case_set_id(depth, rng)
+        assert matcher.match(case_set_id) == match_template_and_params_linear(
+            case_set_id, TOOL_CACHE_ID_TEMPLATES
+        )
+        assert canonicalize_cold(case_set_id) == canonicalize_case_set_id_linear(
+            case_set_id
+        )
+
+        linear = throughput(
+            lambda: match_template_and_params_linear(
+                case_set_id, TOOL_CACHE_ID_TEMPLATES
+            ),
+            args.number,
+        )
+        compiled = throughput(lambda: matcher.match(case_set_id), args.number)
+        linear_canonical = throughput(
+            lambda: canonicalize_case_set_id_linear(case_set_id),
+            max(1, args.number // (depth + 1)),
+        )
+        cold = throughput(
+            lambda: canonicalize_cold(case_set_id), max(1, args.number // (depth + 1))
+        )
+        warm = throughput(lambda: canonicalize_case_set_id(case_set_id), args.number)
+        print(
+            f"{depth:>5} {len(case_set_id):>8} {linear:>15.0f} {compiled:>17.0f} {compiled / linear:>7.1f}x {linear_canonical:>21.0f} {cold:>19.0f} {warm:>19.0f}"
+        )
@@ -0,0 +1,289 @@
+"""
+Local stand-in for the GDC API, serving synthetic data (see `synthetic_gdc.py`) so that the MCP server can be
+benchmarked and load tested without network access. It implements the endpoints and the subset of the
+filter / pagination semantics the MCP server relies on, with optional simulated latency.
+
+    python -m benchmarks.mock_gdc --cases 10000 --port 8001 --latency 0.05
+    python -m qag_mcp.server -t streamable-http --gdc-api http://127.0.0.1:8001
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import operator
+import random
+import threading
+import time
+from typing import Any, Callable
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from .synthetic_gdc import generate_dataset
+
+Predicate = Callable[[dict[str, Any]], bool]
+
+RANGE_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def resolve_field(doc: dict[str, Any], keys: list[str]) -> list[Any]:
+    # all values at the dotted path, flattening any lists along the way (e.g. the diagnoses of a case)
+    values = [doc]
+    for key in keys:
+        next_values = []
+        for value in values:
+            value = value.get(key)
+            if isinstance(value, list):
+                next_values.extend(value)
+            elif value is not None:
+                next_values.append(value)
+        values = next_values
+    return values
+
+
+def normalize(value: Any) -> Any:
+    # like the GDC, match keyword values case insensitively, e.g. 'BAM' and 'bam'
+    return value.casefold() if isinstance(value, str) else value
+
+
+def compile_filters(filters: dict, endpoint: str) -> Predicate:
+    """
+    Compiles GDC API filters into a predicate on the documents of an endpoint.
+    """
+    op = filters.get("op")
+    content = filters.get("content")
+    if op in ("and", "or"):
+        predicates = [compile_filters(f, endpoint) for f in content]
+        if op == "and":
+            return lambda doc: all(p(doc) for p in predicates)
+        return lambda doc: any(p(doc) for p in predicates)
+
+    keys = content["field"].split(".")
+    # fields may be prefixed with the endpoint, e.g. `cases.project.project_id` on the cases endpoint
+    strip_endpoint = keys[0] == endpoint
+
+    def values_of(doc: dict[str, Any]) -> list[Any]:
+        if strip_endpoint and endpoint not in doc:
+            return resolve_field(doc, keys[1:])
+        return resolve_field(doc, keys)
+
+    value = content.get("value")
+    if op in ("in", "=", "exclude", "!="):
+        expected = value if isinstance(value, list) else [value]
+        expected = {normalize(v) for v in expected}
+        matches = lambda doc: any(normalize(v) in expected for v in values_of(doc))
+        if op in ("exclude", "!="):
+            return lambda doc: not matches(doc)
+        return matches
+
+    if op in RANGE_OPS:
+        compare = RANGE_OPS[op]
+        return lambda doc: any(
+            isinstance(v, (int, float)) and compare(v, value) for v in values_of(doc)
+        )
+
+    if op in ("is", "not"):
+        # `is missing` and `not missing`
+        if op == "is":
+            return lambda doc: not values_of(doc)
+        return lambda doc: bool(values_of(doc))
+
+    raise ValueError(f"Unsupported filter op: {op}")
+
+
+def parse_fields(fields: str | list[str] | None) -> dict[str, Any] | None:
+    # dotted field paths as a tree of nested keys, e.g. `case.case_id,case.project.project_id`
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    tree = {"id": {}}
+    for field in fields:
+        node = tree
+        for key in field.strip().split("."):
+            node = node.setdefault(key, {})
+    return tree
+
+
+def project_fields(value: Any, tree: dict[str, Any]) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project_fields(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {
+            k: project_fields(value[k], sub) for k, sub in tree.items() if k in value
+        }
+    return value
+
+
+class MockGDC:
+    """
+    Serves the documents of each endpoint, answering GDC API style queries with filters, fields and pagination.
+    Filtered results are cached, so paging through a query only filters the documents once.
+    """
+
+    def __init__(
+        self,
+        dataset: dict[str, list[dict[str, Any]]],
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        seed: int = 0,
+    ):
+        self.dataset = dataset
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self._rng = random.Random(seed)
+        self.stats = {"requests": 0, "hits": 0, "bytes": 0, "errors": 0}
+
+    @functools.lru_cache(maxsize=256)
+    def _filter(self, endpoint: str, filters_json: str) -> list[dict[str, Any]]:
+        docs = self.dataset[endpoint]
+        if filters_json == "null":
+            return docs
+        predicate = compile_filters(json.loads(filters_json), endpoint)
+        return [doc for doc in docs if predicate(doc)]
+
+    def query(
+        self,
+        endpoint: str,
+        filters: dict | None = None,
+        offset: int = 0,
+        size: int = 10,
+        fields: str | list[str] | None = None,
+    ) -> dict[str, Any]:
+        docs = self._filter(endpoint, json.dumps(filters or None, sort_keys=True))
+        tree = parse_fields(fields)
+        hits = [project_fields(doc, tree) for doc in docs[offset : offset + size]]
+        total = len(docs)
+        return {
+            "data": {
+                "hits": hits,
+                "pagination": {
+                    "count": len(hits),
+                    "total": total,
+                    "size": size,
+                    "from": offset,
+                    "page": offset // size + 1 if size else 1,
+                    "pages": -(-total // size) if size else 1,
+                },
+            },
+            "warnings": {},
+        }
+
+    async def handle(self, request: Request) -> Response:
+        endpoint = request.path_params["endpoint"]
+        if endpoint not in self.dataset:
+            return JSONResponse({"message": f"Unknown endpoint: {endpoint}"}, 404)
+
+        if request.method == "POST":
+            params = await request.json()
+        else:
+            params = dict(request.query_params)
+        filters = params.get("filters")
+        if isinstance(filters, str):
+            filters = json.loads(filters)
+
+        if self.latency or self.latency_jitter:
+            await asyncio.sleep(
+                self.latency + self._rng.uniform(0, self.latency_jitter)
+            )
+
+        self.stats["requests"] += 1
+        try:
+            # filtering is CPU bound, keep it off the event loop so slow queries don't stall others
+            result = await asyncio.to_thread(
+                self.query,
+                endpoint,
+                filters,
+                int(params.get("from", 0)),
+                int(params.get("size", 10)),
+                params.get("fields"),
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats["errors"] += 1
+            return JSONResponse({"message": f"Invalid query: {e!r}"}, 400)
+
+        body = json.dumps(result).encode()
+        self.stats["hits"] += len(result["data"]["hits"])
+        self.stats["bytes"] += len(body)
+        return Response(body, media_type="application/json")
+
+    async def status(self, request: Request) -> Response:
+        return JSONResponse(
+            {
+                "status": "OK",
+                "data_release": "synthetic",
+                "counts": {k: len(v) for k, v in self.dataset.items()},
+                **self.stats,
+            }
+        )
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/status", self.status, methods=["GET"]),
+                Route("/{endpoint}", self.handle, methods=["GET", "POST"]),
+            ]
+        )
+
+
+def start_mock_gdc(mock: MockGDC, host: str = "127.0.0.1", port: int = 0) -> str:
+    """
+    Serves the mock GDC from a background thread, returning its base URL once it's accepting requests.
+    """
+    server = uvicorn.Server(
+        uvicorn.Config(mock.app(), host=host, port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8001)
+    parser.add_argument(
+        "--cases", type=int, default=10000, help="Number of synthetic cases."
+    )
+    parser.add_argument(
+        "--genes",
+        type=int,
+        default=100,
+        help="Number of mutated genes, padded with synthetic genes beyond the well known cancer genes.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds of simulated latency added to every request.",
+    )
+    parser.add_argument(
+        "--latency-jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many seconds of additional, uniformly random latency per request.",
+    )
+    args = parser.parse_args()
+
+    dataset = generate_dataset(n_cases=args.cases, n_genes=args.genes, seed=args.seed)
+    mock = MockGDC(
+        dataset,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        seed=args.seed,
+    )
+    uvicorn.run(mock.app(), host=args.host, port=args.port, log_level="warning")
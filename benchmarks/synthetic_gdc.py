@@ -0,0 +1,249 @@
+"""
+Synthetic GDC data for the local GDC API stand-in (see `mock_gdc.py`).
+
+Case attributes are drawn from the cohort copilot's field config, so that filters generated by cohort copilot
+match synthetic cases, and mutations are drawn from a small set of well known cancer genes (padded with
+synthetic genes) with a long tailed frequency, so that retrievals range from a handful of cases to most of them.
+"""
+
+import random
+import uuid
+from importlib.resources import files
+from typing import Any
+
+import yaml
+
+# gene -> amino acid changes, roughly ordered by how commonly they're mutated
+GENES = {
+    "TP53": ["R175H", "R248Q", "R273H", "R273C", "R248W", "G245S", "Y220C"],
+    "PIK3CA": ["H1047R", "E545K", "E542K", "N345K"],
+    "KRAS": ["G12D", "G12V", "G12C", "G13D", "Q61H"],
+    "APC": ["R1450*", "R876*", "R1114*"],
+    "PTEN": ["R130Q", "R130G", "R233*"],
+    "BRAF": ["V600E", "V600K", "G469A"],
+    "EGFR": ["L858R", "T790M", "G719S"],
+    "IDH1": ["R132H", "R132C"],
+    "NRAS": ["Q61R", "Q61K", "G12D"],
+    "CTNNB1": ["S45F", "T41A", "S33C"],
+    "FBXW7": ["R465C", "R505C"],
+    "ERBB2": ["S310F", "V777L"],
+    "SF3B1": ["K700E"],
+    "GNAS": ["R201C", "R201H"],
+    "AKT1": ["E17K"],
+}
+CNV_CATEGORIES = ["gain", "amplification", "loss", "homozygous deletion"]
+FILE_TYPES = [
+    # (data_format, data_category, data_type, experimental_strategy)
+    ("BAM", "sequencing reads", "Aligned Reads", "WXS"),
+    ("BAM", "sequencing reads", "Aligned Reads", "RNA-Seq"),
+    ("MAF", "simple nucleotide variation", "Masked Somatic Mutation", "WXS"),
+    ("TSV", "copy number variation", "Gene Level Copy Number", "Genotyping Array"),
+    ("SVS", "biospecimen", "Slide Image", "Diagnostic Slide"),
+    ("BCR XML", "clinical", "Clinical Supplement", None),
+]
+# keys of the GDC data model whose values are lists of entities
+LIST_KEYS = {
+    "diagnoses",
+    "treatments",
+    "exposures",
+    "samples",
+    "portions",
+    "analytes",
+    "aliquots",
+}
+# case fields present on every case, the others are only filled in for some cases like on the real GDC
+CORE_FIELDS = {
+    "project.project_id",
+    "project.program.name",
+    "disease_type",
+    "primary_site",
+    "demographic.gender",
+    "demographic.race",
+    "demographic.ethnicity",
+    "demographic.vital_status",
+    "diagnoses.age_at_diagnosis",
+    "diagnoses.primary_diagnosis",
+    "diagnoses.year_of_diagnosis",
+    "exposures.tobacco_smoking_status",
+    "samples.tissue_type",
+}
+OPTIONAL_FIELD_RATE = 0.2
+# plausible ranges for numeric fields, the config only has the ranges the GDC validates against
+RANGES = {
+    "diagnoses.age_at_diagnosis": (20 * 365, 90 * 365),
+    "diagnoses.year_of_diagnosis": (1990, 2023),
+    "exposures.cigarettes_per_day": (0, 40),
+    "exposures.pack_years_smoked": (0, 80),
+    "exposures.tobacco_smoking_onset_year": (1950, 2010),
+}
+
+
+def load_case_fields() -> dict[str, Any]:
+    """
+    The case fields of the cohort copilot config as a tree of nested keys, with the possible values at the leaves.
+    """
+    # not through the cohort_copilot package, which would import its model dependencies
+    config_path = files("qag_mcp").joinpath("cohort_copilot", "config.yaml")
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+
+    tree = {}
+    for tab in config["tabs"]:
+        for card in tab["cards"]:
+            # files fields are generated along with the files below
+            if not card["field"].startswith("cases."):
+                continue
+            path = card["field"].removeprefix("cases.")
+            node = tree
+            *parents, leaf = path.split(".")
+            for key in parents:
+                node = node.setdefault(key, {})
+            values = card["values"]
+            if isinstance(values, dict):
+                values = RANGES.get(path, (values["min"], values["max"]))
+            node[leaf] = (path, values)
+    return tree
+
+
+def generate_entity(tree: dict[str, Any], rng: random.Random) -> dict[str, Any]:
+    entity = {}
+    for key, node in tree.items():
+        if isinstance(node, dict):
+            if key in LIST_KEYS:
+                value = [generate_entity(node, rng) for _ in range(rng.randint(1, 2))]
+                value = [v for v in value if v]
+            else:
+                value = generate_entity(node, rng)
+            if value:
+                entity[key] = value
+            continue
+
+        field, values = node
+        if field not in CORE_FIELDS and rng.random() > OPTIONAL_FIELD_RATE:
+            continue
+        if isinstance(values, tuple):
+            entity[key] = rng.randint(*values)
+        else:
+            entity[key] = rng.choice(values)
+    return entity
+
+
+def make_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_dataset(
+    n_cases: int = 10000,
+    n_genes: int = 100,
+    ssms_per_case: float = 5.0,
+    cnvs_per_case: float = 3.0,
+    files_per_case: float = 3.0,
+    msi_rate: float = 0.05,
+    seed: int = 0,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Generates the documents of each GDC API endpoint the MCP server queries, scaling linearly with `n_cases`.
+    Occurrences and files embed their case, like the hits of the real GDC API do.
+    """
+    rng = random.Random(seed)
+    case_fields = load_case_fields()
+
+    genes = dict(GENES)
+    for i in range(len(genes), n_genes):
+        genes[f"SYN{i}"] = [f"A{rng.randint(1, 999)}V", f"R{rng.randint(1, 999)}*"]
+    gene_names = list(genes)
+    # long tailed, so the first few genes are mutated in a large fraction of cases
+    gene_weights = [1 / (rank + 1) for rank in range(len(gene_names))]
+
+    ssms = {}
+    for gene, aa_changes in genes.items():
+        for aa_change in aa_changes:
+            ssm_id = make_id(rng)
+            ssms[(gene, aa_change)] = {
+                "id": ssm_id,
+                "ssm_id": ssm_id,
+                "mutation_type": "Simple Somatic Mutation",
+                "gene_aa_change": [f"{gene} {aa_change}"],
+                "consequence": [
+                    {"transcript": {"aa_change": aa_change, "gene": {"symbol": gene}}}
+                ],
+            }
+
+    cnvs = {}
+    for gene in gene_names:
+        for category in CNV_CATEGORIES:
+            cnv_id = make_id(rng)
+            cnvs[(gene, category)] = {
+                "id": cnv_id,
+                "cnv_id": cnv_id,
+                "cnv_change": (
+                    "Gain" if category in ("gain", "amplification") else "Loss"
+                ),
+                "cnv_change_5_category": category,
+                "consequence": [{"gene": {"symbol": gene}}],
+            }
+
+    cases = []
+    ssm_occurrences = []
+    cnv_occurrences = []
+    case_files = []
+    for _ in range(n_cases):
+        case_id = make_id(rng)
+        case = {"id": case_id, "case_id": case_id, **generate_entity(case_fields, rng)}
+        # keep the program consistent with the project
+        project = case["project"]
+        project["program"] = {"name": project["project_id"].split("-")[0]}
+        case["files"] = []
+        cases.append(case)
+
+        mutated_genes = set(
+            rng.choices(
+                gene_names, gene_weights, k=round(rng.expovariate(1 / ssms_per_case))
+            )
+        )
+        for gene in mutated_genes:
+            ssm = ssms[(gene, rng.choice(genes[gene]))]
+            ssm_occurrences.append(
+                {"id": make_id(rng), "ssm": ssm, "case": case},
+            )
+
+        altered_genes = set(
+            rng.choices(
+                gene_names, gene_weights, k=round(rng.expovariate(1 / cnvs_per_case))
+            )
+        )
+        for gene in altered_genes:
+            cnv = cnvs[(gene, rng.choice(CNV_CATEGORIES))]
+            cnv_occurrences.append(
+                {"id": make_id(rng), "cnv": cnv, "case": case},
+            )
+
+        msi_status = "msi" if rng.random() < msi_rate else "mss"
+        for _ in range(max(1, round(rng.expovariate(1 / files_per_case)))):
+            data_format, data_category, data_type, experimental_strategy = rng.choice(
+                FILE_TYPES
+            )
+            file_id = make_id(rng)
+            file = {
+                "file_id": file_id,
+                "data_format": data_format,
+                "data_category": data_category,
+                "data_type": data_type,
+                "access": "open" if data_category == "clinical" else "controlled",
+            }
+            if experimental_strategy is not None:
+                file["experimental_strategy"] = experimental_strategy
+            if experimental_strategy == "WXS" and data_format == "BAM":
+                file["msi_status"] = msi_status
+            # cases reference a summary of their files, while file hits embed their cases
+            case["files"].append(file)
+            case_files.append({"id": file_id, **file, "cases": [case]})
+
+    return {
+        "cases": cases,
+        "ssms": list(ssms.values()),
+        "ssm_occurrences": ssm_occurrences,
+        "cnvs": list(cnvs.values()),
+        "cnv_occurrences": cnv_occurrences,
+        "files": case_files,
+    }
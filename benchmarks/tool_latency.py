@@ -0,0 +1,353 @@
+"""
+End to end latency of the MCP server tools against the local GDC API stand-in (see `mock_gdc.py`),
+reporting p50/p95/p99 latency, GDC pages fetched, bytes transferred and peak memory per scenario.
+
+    python -m benchmarks.tool_latency --cases 10000 --latency 0.05 --iterations 50
+
+Retrieval and set operation tools defer their GDC queries until a case set is consumed,
+so every scenario ends with the `get_case_set_size` call that an agent would make to use its result.
+Each iteration starts from empty server side caches, unless `--warm` is given.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+import httpx
+
+from qag_mcp import server
+from qag_mcp._cache import CaseCache, CaseQueryCache
+from qag_mcp._utils import configure_gdc_client
+
+from .synthetic_gdc import CNV_CATEGORIES, GENES
+
+# scenarios set up their inputs (untimed) and return the calls to time
+Scenario = Callable[[random.Random], Awaitable[Callable[[], Awaitable]]]
+
+PROJECTS = ["TCGA-BRCA", "TCGA-LUAD", "TCGA-COAD", "TARGET-AML", "CPTAC-3"]
+GENDERS = ["female", "male"]
+
+
+def generate_cohort_filter(cohort_description: str) -> str:
+    # stands in for the cohort copilot model, which is out of scope here, e.g. 'female patients'
+    gender = cohort_description.split()[0]
+    return json.dumps(
+        {
+            "op": "and",
+            "content": [
+                {
+                    "op": "in",
+                    "content": {
+                        "field": "cases.demographic.gender",
+                        "value": [gender],
+                    },
+                }
+            ],
+        }
+    )
+
+
+get_cases_by_cohort_description = server.make_cohort_copilot_tool(
+    generate_cohort_filter
+)
+
+
+async def ssm(rng: random.Random):
+    gene = rng.choice(list(GENES))
+    aa_change = rng.choice([None, *GENES[gene]])
+
+    async def run():
+        case_set_id = await server.get_simple_somatic_mutation_occurrences(
+            gene, aa_change
+        )
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def cnv(rng: random.Random):
+    gene = rng.choice(list(GENES))
+    cnv_change = rng.choice([None, *CNV_CATEGORIES])
+    if cnv_change == "loss":
+        cnv_change = "heterozygous deletion"
+
+    async def run():
+        case_set_id = await server.get_copy_number_variant_occurrences(gene, cnv_change)
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def msi(rng: random.Random):
+    msi_status = rng.choice(["msi", "mss"])
+
+    async def run():
+        case_set_id = await server.get_microsatellite_instability_occurrences(
+            msi_status
+        )
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def project(rng: random.Random):
+    project = rng.choice(PROJECTS)
+
+    async def run():
+        case_set_id = await server.get_cases_by_project(project)
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def cohort(rng: random.Random):
+    cohort_description = f"{rng.choice(GENDERS)} patients"
+
+    async def run():
+        case_set_id = await get_cases_by_cohort_description(cohort_description)
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def intersection(rng: random.Random):
+    # e.g. 'how many TCGA-BRCA cases have a TP53 mutation?'
+    mutation = await server.get_simple_somatic_mutation_occurrences(
+        rng.choice(list(GENES))
+    )
+    cases = await server.get_cases_by_project(rng.choice(PROJECTS))
+
+    async def run():
+        case_set_id = await server.compute_case_intersection(mutation, cases)
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def union(rng: random.Random):
+    # occurrence level operands, so the union is computed in memory
+    mutation = await server.get_simple_somatic_mutation_occurrences(
+        rng.choice(list(GENES))
+    )
+    alteration = await server.get_copy_number_variant_occurrences(
+        rng.choice(list(GENES))
+    )
+
+    async def run():
+        case_set_id = await server.compute_case_union(mutation, alteration)
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+async def size(rng: random.Random):
+    # sizes of case sets that have already been evaluated, e.g. when comparing prevalences
+    genes = rng.sample(list(GENES), 2)
+    case_set_id = await server.compute_case_intersection(
+        await server.get_simple_somatic_mutation_occurrences(genes[0]),
+        await server.get_simple_somatic_mutation_occurrences(genes[1]),
+    )
+    await server.get_case_set_size(case_set_id)
+
+    async def run():
+        await server.get_case_set_size(case_set_id)
+
+    return run
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "ssm": ssm,
+    "cnv": cnv,
+    "msi": msi,
+    "project": project,
+    "cohort": cohort,
+    "intersection": intersection,
+    "union": union,
+    "size": size,
+}
+
+
+def reset_caches():
+    server.case_cache = CaseCache(max_bytes=256 * 1024**2, ttl=3600)
+    server.case_queries = CaseQueryCache(maxsize=1000, ttl=3600)
+    server.case_counts.clear()
+    server.case_expressions.clear()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_gdc_process(args: argparse.Namespace):
+    """
+    Runs the GDC API stand-in in its own process, so that it doesn't compete with the MCP server for the GIL.
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.mock_gdc",
+            f"--port={port}",
+            f"--cases={args.cases}",
+            f"--genes={args.genes}",
+            f"--seed={args.seed}",
+            f"--latency={args.latency}",
+            f"--latency-jitter={args.latency_jitter}",
+        ]
+    )
+    try:
+        # generating the dataset takes a moment
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("GDC API stand-in exited during startup")
+            try:
+                httpx.get(f"{url}/status")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def gdc_stats(url: str) -> dict[str, int]:
+    return httpx.get(f"{url}/status").json()
+
+
+def percentile(latencies: list[float], p: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method="inclusive")[p - 1]
+
+
+async def run_scenario(
+    name: str, url: str, args: argparse.Namespace
+) -> dict[str, float | str]:
+    scenario = SCENARIOS[name]
+    rng = random.Random(args.seed)
+    latencies = []
+    pages = 0
+    transferred = 0
+    for i in range(args.warmup + args.iterations):
+        if not args.warm:
+            reset_caches()
+        timed = await scenario(rng)
+
+        before = gdc_stats(url)
+        start = time.perf_counter()
+        await timed()
+        latency = time.perf_counter() - start
+        after = gdc_stats(url)
+
+        if i >= args.warmup:
+            latencies.append(latency)
+            pages += after["requests"] - before["requests"]
+            transferred += after["bytes"] - before["bytes"]
+
+    # peak memory in a separate traced iteration, tracing slows down allocations too much to time them
+    if not args.warm:
+        reset_caches()
+    timed = await scenario(rng)
+    tracemalloc.start()
+    await timed()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": name,
+        "iterations": args.iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "pages": pages / args.iterations,
+        "bytes": transferred / args.iterations,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+async def main(args: argparse.Namespace):
+    with mock_gdc_process(args) as url:
+        configure_gdc_client(
+            api_url=url,
+            max_workers=args.gdc_max_workers,
+            pool_maxsize=args.gdc_pool_maxsize,
+        )
+        print(
+            f"{'scenario':<13} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'pages':>7} {'KiB':>9} {'peak MiB':>9}"
+        )
+        results = []
+        for name in args.scenarios:
+            # silence the tool call logging of the server
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                result = await run_scenario(name, url, args)
+            results.append(result)
+            print(
+                f"{name:<13} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                f"{result['pages']:>7.1f} {result['bytes'] / 1024:>9.1f} {result['peak_memory_bytes'] / 1024**2:>9.2f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=2,
+        help="Untimed iterations per scenario, e.g. to open pooled connections.",
+    )
+    parser.add_argument(
+        "--warm",
+        default=False,
+        action="store_true",
+        help="Keep the server side caches between iterations instead of starting every iteration cold.",
+    )
+    parser.add_argument(
+        "--cases", type=int, default=10000, help="Number of synthetic cases."
+    )
+    parser.add_argument("--genes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds of simulated GDC API latency per request.",
+    )
+    parser.add_argument(
+        "--latency-jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many seconds of additional, uniformly random latency per request.",
+    )
+    parser.add_argument("--gdc-max-workers", type=int, default=1)
+    parser.add_argument("--gdc-pool-maxsize", type=int, default=16)
+    parser.add_argument(
+        "-o", "--output", default=None, help="Also write the results as JSON here."
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,171 @@
+import sys
+
+from cachetools import LRUCache, TTLCache
+
+from ._case_sets import CaseSet
+from ._metrics import query_counters
+from ._store import CaseSetStore
+
+
+class CaseCache(TTLCache):
+    """
+    A TTL cache of case sets bounded by the memory used by its entries rather than their count.
+    Once `max_bytes` is reached the least recently used case sets are evicted.
+    Lookups (see `lookup`), evictions and expirations are counted and reported by `stats()`.
+
+    An optional persistent `store` backs the in-memory cache: case sets are written through to it,
+    and case sets missing from memory (evicted, or from before a restart) are loaded back from it.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, store: CaseSetStore | None = None):
+        super().__init__(maxsize=max_bytes, ttl=ttl, getsizeof=sys.getsizeof)
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        # case sets loaded from the store that haven't been looked up since, so that lookup counts them as store hits
+        self._from_store = set()
+
+    def __contains__(self, key) -> bool:
+        # membership tests check for the case set without counting a lookup, e.g. before deferring it
+        if super().__contains__(key):
+            return True
+
+        if self.store is not None:
+            case_set = self.store.get(key)
+            if case_set is not None:
+                # already persisted, so only add it to memory
+                super().__setitem__(key, case_set)
+                self._from_store.add(key)
+                return True
+
+        return False
+
+    def lookup(self, key) -> CaseSet | None:
+        """
+        Returns the members of a case set if they're cached, or None, counting the lookup as a hit or miss.
+        Only called where the members are actually needed, so the hit rate isn't skewed by membership tests.
+        """
+        if key not in self:
+            self.misses += 1
+            query_counters.inc("case_cache_misses")
+            return None
+        if key in self._from_store:
+            self._from_store.discard(key)
+            self.store_hits += 1
+            query_counters.inc("case_cache_store_hits")
+        else:
+            self.hits += 1
+            query_counters.inc("case_cache_hits")
+        return self[key]
+
+    def __setitem__(self, key, value):
+        if self.store is not None:
+            if super().__contains__(key) and self[key] is value:
+                # re-setting the same case set just refreshes its TTL
+                self.store.touch(key)
+            else:
+                self.store.put(key, value)
+        super().__setitem__(key, value)
+
+    def pop(self, key, *default):
+        # pops are cache maintenance (e.g. evictions) rather than lookups, so bypass the counting
+        if super().__contains__(key):
+            value = self[key]
+            del self[key]
+            self._from_store.discard(key)
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self):
+        # only called by the cache itself to make room for a new entry
+        item = super().popitem()
+        self.evictions += 1
+        self._from_store.discard(item[0])
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired or ())
+        for key, _ in expired or ():
+            self._from_store.discard(key)
+        return expired
+
+    def stats(self) -> dict[str, int]:
+        stats = {
+            "entries": len(self),
+            "bytes": self.currsize,
+            "max_bytes": self.maxsize,
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+        if self.store is not None:
+            stats["store_entries"] = len(self.store)
+        return stats
+
+
+class CaseQueryCache(TTLCache):
+    """
+    A TTL cache of the queries of case sets, backed by the same optional store as `CaseCache`.
+    Sharing the queries through the store lets any server worker materialize or count a deferred
+    case set that was returned by another worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, store: CaseSetStore | None = None):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.store = store
+
+    def __contains__(self, key) -> bool:
+        if super().__contains__(key):
+            return True
+
+        if self.store is not None:
+            query = self.store.get_query(key)
+            if query is not None:
+                super().__setitem__(key, query)
+                return True
+
+        return False
+
+    def __setitem__(self, key, value):
+        if self.store is not None:
+            if super().__contains__(key) and self[key] is value:
+                self.store.touch(key)
+            else:
+                self.store.put_query(key, value)
+        super().__setitem__(key, value)
+
+
+class CaseSetLineage(LRUCache):
+    """
+    Maps compact case set handles to the full case set IDs they stand for, backed by the optional store.
+    Unlike case sets, a lost handle can't be recomputed, so entries never expire from the store.
+    """
+
+    def __init__(self, maxsize: int, store: CaseSetStore | None = None):
+        super().__init__(maxsize=maxsize)
+        self.store = store
+
+    def __contains__(self, key) -> bool:
+        if super().__contains__(key):
+            return True
+
+        if self.store is not None:
+            case_set_id = self.store.get_lineage(key)
+            if case_set_id is not None:
+                super().__setitem__(key, case_set_id)
+                return True
+
+        return False
+
+    def __setitem__(self, key, value):
+        if self.store is not None and not super().__contains__(key):
+            self.store.put_lineage(key, value)
+        super().__setitem__(key, value)
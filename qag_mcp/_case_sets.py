@@ -0,0 +1,117 @@
+import sys
+import threading
+from array import array
+from typing import Iterable, Iterator
+
+
+class CaseIdTable:
+    """
+    Interns case UUIDs to dense integer indexes, so that each UUID string is stored once
+    no matter how many cached case sets it belongs to.
+    """
+
+    def __init__(self):
+        self._indexes: dict[str, int] = {}
+        self._case_ids: list[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._case_ids)
+
+    def intern(self, case_id: str) -> int:
+        index = self._indexes.get(case_id)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(case_id)
+                if index is None:
+                    index = len(self._case_ids)
+                    self._case_ids.append(case_id)
+                    self._indexes[case_id] = index
+        return index
+
+    def __sizeof__(self) -> int:
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self._indexes)
+            + sys.getsizeof(self._case_ids)
+            + sum(sys.getsizeof(case_id) for case_id in self._case_ids)
+        )
+
+    def case_id(self, index: int) -> str:
+        return self._case_ids[index]
+
+
+case_id_table = CaseIdTable()
+
+
+def bits_from_indexes(indexes: Iterable[int]) -> int:
+    bitmap = bytearray()
+    for index in indexes:
+        byte_index = index >> 3
+        if byte_index >= len(bitmap):
+            bitmap.extend(bytes(byte_index + 1 - len(bitmap)))
+        bitmap[byte_index] |= 1 << (index & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def indexes_from_bits(bits: int) -> array:
+    indexes = array("I")
+    bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(bitmap):
+        if byte:
+            base = byte_index << 3
+            for bit in range(8):
+                if byte >> bit & 1:
+                    indexes.append(base + bit)
+    return indexes
+
+
+class CaseSet:
+    """
+    An immutable set of cases over interned case indexes.
+    Similar to the containers of a roaring bitmap, dense sets are stored as a bitmap and sparse sets
+    as a sorted array of 32 bit indexes, whichever is smaller. The bitmap is a python int, so
+    intersection, union and cardinality are word parallel operations that never touch the UUID strings.
+    """
+
+    __slots__ = ("_bits", "_indexes", "_size")
+
+    def __init__(self, bits: int, size: int | None = None):
+        self._size = bits.bit_count() if size is None else size
+        if self._size * 4 < (bits.bit_length() + 7) // 8:
+            self._bits = None
+            self._indexes = indexes_from_bits(bits)
+        else:
+            self._bits = bits
+            self._indexes = None
+
+    @classmethod
+    def from_case_ids(cls, case_ids: Iterable[str]) -> "CaseSet":
+        return cls(bits_from_indexes(case_id_table.intern(c) for c in case_ids))
+
+    @property
+    def bits(self) -> int:
+        if self._bits is not None:
+            return self._bits
+        return bits_from_indexes(self._indexes)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        indexes = self._indexes
+        if indexes is None:
+            indexes = indexes_from_bits(self._bits)
+        for index in indexes:
+            yield case_id_table.case_id(index)
+
+    def __and__(self, other: "CaseSet") -> "CaseSet":
+        return CaseSet(self.bits & other.bits)
+
+    def __or__(self, other: "CaseSet") -> "CaseSet":
+        return CaseSet(self.bits | other.bits)
+
+    def __sizeof__(self) -> int:
+        # count the members as well, so sys.getsizeof reflects the memory actually held by this set
+        members = self._indexes if self._indexes is not None else self._bits
+        return object.__sizeof__(self) + sys.getsizeof(members)
@@ -47,10 +47,18 @@ CaseSetId = Annotated[
         description=(
             "ID representing a set of cases matching a specified query. "
             "The retrieved cases are cached server side and are referenced by this identifier. "
-            "The ID additionally encodes the method by which the case set was computed, for example 'SSM-in-BRAF'."
+            "The ID additionally encodes the method by which the case set was computed, for example 'SSM-in-BRAF'. "
+            "IDs of nested set operations may instead be a short handle, for example 'Cases-Ref-(3f9a0c1e2b7d4a65)'."
         ),
     ),
 ]
+CaseSetIds = Annotated[
+    list[CaseSetId],
+    Field(
+        description="IDs of two or more case sets, as returned by the other tools of this server.",
+        min_length=2,
+    ),
+]
 CaseCount = Annotated[
     int,
     Field(
@@ -67,3 +75,5 @@ TOOL_CACHE_ID_TEMPLATES = {
     "get_cases_by_project": "Cases-Project-({project})",
     "get_cases_by_cohort_description": "Cases-Cohort-({cohort_description})",
 }
+# short content addressed stand-in for long case set IDs, see `make_case_set_handle`
+CASE_SET_HANDLE_TEMPLATE = "Cases-Ref-({digest})"
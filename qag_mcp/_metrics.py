@@ -0,0 +1,186 @@
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+# latency buckets in seconds, GDC retrievals of large case sets take tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Sample = tuple[str, dict[str, str], float]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{k}="{_escape_label_value(str(v))}"' for k, v in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """
+    A metric family in the Prometheus text exposition format, with one series per combination of label values.
+    Updates take a lock, so metrics can be recorded from threads other than the event loop.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _label_dict(self, label_values: tuple[str, ...]) -> dict[str, str]:
+        if len(label_values) != len(self.labels):
+            raise ValueError(
+                f"{self.name} takes the labels {self.labels}, got {label_values}"
+            )
+        return dict(zip(self.labels, label_values))
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]: ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._label_dict(label_values)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, self._label_dict(label_values), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per series: the count of observations in each bucket (not cumulative), then the sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        self._label_dict(label_values)
+        with self._lock:
+            counts, total = self._series.setdefault(
+                label_values, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            series = {k: (list(c), t[0]) for k, (c, t) in self._series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            labels = self._label_dict(label_values)
+            cumulative = 0
+            for le, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {
+                    **labels,
+                    "le": _format_value(le),
+                }, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class CallbackMetric(Metric):
+    """
+    A metric read at scrape time, for state that is already tracked elsewhere (e.g. the counters of a cache).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        callback: Callable[[], float],
+    ):
+        super().__init__(name, help)
+        self.type = type
+        self.callback = callback
+
+    def samples(self) -> Iterator[Sample]:
+        yield self.name, {}, self.callback()
+
+
+# clients may tag the MCP requests of a query with this header, e.g. agent/replay.py tags each query it runs
+QUERY_TAG_HEADER = "x-query-tag"
+# the tag of the query the current tool call serves, set for the duration of the call
+query_tag: ContextVar[str | None] = ContextVar("query_tag", default=None)
+
+
+class QueryCounters:
+    """
+    Counters by query tag, so that GDC requests and case cache lookups can be attributed to queries that
+    run concurrently, which the global counters can't. Work shared between queries (e.g. a coalesced
+    retrieval) is counted for the query that started it. Only the `maxsize` most recent tags are kept.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._counts: OrderedDict[str, dict[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1):
+        tag = query_tag.get()
+        if tag is None:
+            return
+        with self._lock:
+            counts = self._counts.get(tag)
+            if counts is None:
+                counts = self._counts[tag] = {}
+                if len(self._counts) > self.maxsize:
+                    self._counts.popitem(last=False)
+            counts[name] = counts.get(name, 0) + amount
+
+    def get(self, tag: str) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts.get(tag, {}))
+
+
+query_counters = QueryCounters()
+
+
+def render_metrics(metrics: list[Metric]) -> str:
+    """
+    Renders metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    return "".join(metric.render() for metric in metrics)
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from typing import Any
+
+from ._utils import gdc_count_async, gdc_query_all_async
+
+# path from the hits of each endpoint to their case, used to move case level filters between endpoints
+CASE_FIELD_PREFIXES = {
+    "cases": "cases.",
+    "ssm_occurrences": "case.",
+    "cnv_occurrences": "case.",
+    "files": "cases.",
+}
+# top level case fields known to be nested beneath the hits of each endpoint (any on the cases endpoint itself),
+# filters on other fields (e.g. `files.data_format` from cohort copilot) can't be moved there
+_OCCURRENCE_CASE_FIELDS = {
+    "case_id",
+    "submitter_id",
+    "project",
+    "primary_site",
+    "disease_type",
+    "demographic",
+    "diagnoses",
+    "exposures",
+}
+NESTED_CASE_FIELDS = {
+    "ssm_occurrences": _OCCURRENCE_CASE_FIELDS,
+    "cnv_occurrences": _OCCURRENCE_CASE_FIELDS,
+    "files": _OCCURRENCE_CASE_FIELDS | {"samples"},
+}
+
+
+@dataclass(frozen=True)
+class CaseQuery:
+    """
+    A GDC API query whose hits resolve to a set of cases.
+    `case_id_field` is the dotted path to the case ID within each hit,
+    any lists along the path are flattened (e.g. the cases of a file).
+    """
+
+    endpoint: str
+    filters: dict
+    case_id_field: str
+
+    @property
+    def counts_cases(self) -> bool:
+        # every hit of the cases endpoint is a distinct case, so the pagination total is the case count
+        return self.endpoint == "cases"
+
+
+def extract_case_ids(hits: list[dict[str, Any]], case_id_field: str) -> set[str]:
+    case_ids = set()
+    for hit in hits:
+        values = [hit]
+        for key in case_id_field.split("."):
+            next_values = []
+            for value in values:
+                value = value.get(key)
+                if isinstance(value, list):
+                    next_values.extend(value)
+                elif value is not None:
+                    next_values.append(value)
+            values = next_values
+        case_ids.update(values)
+    return case_ids
+
+
+async def fetch_case_ids(query: CaseQuery) -> set[str]:
+    hits = await gdc_query_all_async(
+        endpoint=query.endpoint,
+        filters=query.filters,
+        fields=[query.case_id_field],
+    )
+    return extract_case_ids(hits, query.case_id_field)
+
+
+async def count_cases(query: CaseQuery) -> int:
+    """
+    Number of cases matched by the query, only downloading hits when the pagination total
+    does not directly correspond to a number of cases.
+    """
+    if query.counts_cases:
+        return await gdc_count_async(query.endpoint, query.filters)
+    return len(await fetch_case_ids(query))
+
+
+def rebase_case_filters(filters: dict, endpoint: str) -> dict | None:
+    """
+    Rewrites a filter on the cases endpoint so that its fields are relative to the cases of `endpoint`,
+    for example `cases.project.project_id` -> `case.project.project_id` for `ssm_occurrences`.
+    Returns None if it filters on a field that isn't known to exist beneath the hits of `endpoint`.
+    """
+    content = filters["content"]
+    if isinstance(content, list):
+        rebased = [rebase_case_filters(f, endpoint) for f in content]
+        if any(f is None for f in rebased):
+            return None
+        return {**filters, "content": rebased}
+
+    # fields on the cases endpoint may or may not be prefixed with `cases.`
+    field = content["field"].removeprefix("cases.")
+    nested_fields = NESTED_CASE_FIELDS.get(endpoint)
+    if nested_fields is not None and field.split(".")[0] not in nested_fields:
+        return None
+    return {
+        **filters,
+        "content": {**content, "field": CASE_FIELD_PREFIXES[endpoint] + field},
+    }
+
+
+def intersect_case_queries(a: CaseQuery, b: CaseQuery) -> CaseQuery | None:
+    """
+    Combine two case queries into a single query matching the intersection of their cases, if possible.
+    The GDC evaluates filters per hit, so a conjunction only corresponds to a case intersection when
+    at least one of the queries filters on case level fields (i.e. is on the cases endpoint).
+    Two occurrence level filters on the same endpoint would require the same occurrence to match both.
+    Case level filters on fields that the other endpoint doesn't nest can't be combined either,
+    those intersections are left to be computed in memory.
+    """
+    if not b.counts_cases:
+        a, b = b, a
+    if not b.counts_cases or a.endpoint not in CASE_FIELD_PREFIXES:
+        return None
+
+    case_filters = rebase_case_filters(b.filters, a.endpoint)
+    if case_filters is None:
+        return None
+
+    return CaseQuery(
+        endpoint=a.endpoint,
+        filters={"op": "and", "content": [a.filters, case_filters]},
+        case_id_field=a.case_id_field,
+    )
+
+
+def union_case_queries(a: CaseQuery, b: CaseQuery) -> CaseQuery | None:
+    """
+    Combine two case queries into a single query matching the union of their cases, if possible.
+    Unlike intersections, a disjunction only corresponds to a case union when both queries are on the cases endpoint.
+    """
+    if not a.counts_cases or not b.counts_cases:
+        return None
+
+    return CaseQuery(
+        endpoint="cases",
+        filters={"op": "or", "content": [a.filters, b.filters]},
+        case_id_field=a.case_id_field,
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Any, Literal
+
+
+class GDCRecording:
+    """
+    A compressed archive of GDC API responses for deterministic, offline performance runs.
+    In `record` mode every response is appended to the archive, keyed by the endpoint and the request payload
+    (filters, fields, offset and page size), and in `replay` mode responses are served from the archive
+    instead of the GDC API, after a fixed simulated latency. Requests missing from the archive fail when replaying.
+
+    The archive is gzipped JSON lines, flushed after every response so it stays readable if the server is killed.
+    A killed recording lacks the end of its gzip stream, so resuming it first rewrites the recovered responses
+    into a complete archive, rather than appending a new gzip stream after the truncated one.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: Literal["record", "replay"],
+        latency: float = 0.0,
+    ):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded = 0
+        self.replayed = 0
+        self._responses: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+        try:
+            lines, complete = self._load()
+        except FileNotFoundError:
+            if mode == "replay":
+                raise
+            lines, complete = [], True
+        if mode == "record":
+            if not complete:
+                self._rewrite(lines)
+            self._file = gzip.open(path, "at", encoding="utf-8")
+
+    def _load(self) -> tuple[list[str], bool]:
+        # returns the lines of the recovered responses, and whether the archive was read to its end
+        lines = []
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    entry = json.loads(line)
+                    self._responses[entry["key"]] = entry["response"]
+                    lines.append(line)
+            except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError):
+                # recording was interrupted, the last response may have been cut off
+                return lines, False
+        return lines, True
+
+    def _rewrite(self, lines: list[str]):
+        # replaced atomically, so killing the server again doesn't lose the recovered responses
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def make_key(endpoint: str, payload: dict) -> str:
+        # independent of the API URL, so responses recorded from the GDC can be replayed anywhere
+        request = json.dumps([endpoint, payload], sort_keys=True)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, endpoint: str, payload: dict, response: dict[str, Any]):
+        key = self.make_key(endpoint, payload)
+        with self._lock:
+            if key in self._responses:
+                return
+            self._responses[key] = response
+            entry = {
+                "key": key,
+                "endpoint": endpoint,
+                "payload": payload,
+                "response": response,
+            }
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    async def replay_async(self, endpoint: str, payload: dict) -> dict[str, Any]:
+        response = self._responses.get(self.make_key(endpoint, payload))
+        if response is None:
+            raise LookupError(
+                f"No recorded GDC API response for {endpoint} with payload {json.dumps(payload)}"
+            )
+        self.replayed += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return response
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "entries": len(self._responses),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,228 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+
+from ._case_sets import CaseSet
+from ._queries import CaseQuery
+
+
+class CaseSetStore(ABC):
+    """
+    Interface of a store backing the server side caches, keyed by case set ID.
+    A store may be persistent (surviving restarts) and/or shared between server worker processes,
+    it holds both materialized case sets and the queries of case sets whose retrieval was deferred,
+    as well as the full case set IDs behind compact case set handles.
+    """
+
+    @abstractmethod
+    def get(self, case_set_id: str) -> CaseSet | None: ...
+
+    @abstractmethod
+    def put(self, case_set_id: str, case_set: CaseSet): ...
+
+    @abstractmethod
+    def get_query(self, case_set_id: str) -> CaseQuery | None: ...
+
+    @abstractmethod
+    def put_query(self, case_set_id: str, query: CaseQuery): ...
+
+    @abstractmethod
+    def get_lineage(self, handle: str) -> str | None: ...
+
+    @abstractmethod
+    def put_lineage(self, handle: str, case_set_id: str): ...
+
+    @abstractmethod
+    def touch(self, case_set_id: str):
+        """
+        Refresh the expiry of a case set and/or its query.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Number of case sets in the store, reported in the case cache stats.
+        """
+
+
+class SQLiteCaseSetStore(CaseSetStore):
+    """
+    Stores case sets in a SQLite file, the local stand-in for a shared cache service.
+    The file survives server restarts, and all server workers on a node can point at the same file
+    to see each other's case sets (the database is opened in WAL mode for concurrent access).
+    Members are stored as compressed case UUIDs rather than interned indexes,
+    since the interning of case IDs is local to a process.
+    Each entry expires `ttl` seconds after it was last stored or touched.
+
+    The store is called from the server's event loop, so writes are queued to a writer thread with
+    its own connection: waiting on another worker's write lock (or compressing a large case set)
+    never blocks the loop, and in WAL mode the reads on the loop don't wait on writers either.
+    A case set written by this worker is in its memory cache until the write lands, so only other
+    workers may briefly miss it.
+    """
+
+    # expired rows are purged every this many writes
+    PURGE_INTERVAL = 100
+    # refreshing an entry that has most of its TTL left is wasted work, so an entry is touched at
+    # most once per this fraction of the TTL (and may expire from the store that much early)
+    TOUCH_INTERVAL = 0.1
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        # when each entry was last stored or touched by this worker
+        self._touched: dict[str, float] = {}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # other worker processes may hold the write lock, wait on it rather than failing
+        self._write_conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="case-store"
+        )
+        with self._write_conn:
+            self._write_conn.execute("PRAGMA journal_mode=WAL")
+            self._write_conn.execute(
+                "CREATE TABLE IF NOT EXISTS case_sets ("
+                "case_set_id TEXT PRIMARY KEY, "
+                "case_ids BLOB NOT NULL, "
+                "expires REAL NOT NULL)"
+            )
+            self._write_conn.execute(
+                "CREATE TABLE IF NOT EXISTS case_queries ("
+                "case_set_id TEXT PRIMARY KEY, "
+                "query TEXT NOT NULL, "
+                "expires REAL NOT NULL)"
+            )
+            # handles are content addressed and tiny, so they never expire
+            self._write_conn.execute(
+                "CREATE TABLE IF NOT EXISTS case_set_lineage ("
+                "handle TEXT PRIMARY KEY, "
+                "case_set_id TEXT NOT NULL)"
+            )
+        self.purge_expired()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM case_sets WHERE expires > ?", (time.time(),)
+            ).fetchone()
+        return count
+
+    def get(self, case_set_id: str) -> CaseSet | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT case_ids FROM case_sets WHERE case_set_id = ? AND expires > ?",
+                (case_set_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        case_ids = zlib.decompress(row[0]).decode()
+        return CaseSet.from_case_ids(case_ids.split("\n") if case_ids else [])
+
+    def put(self, case_set_id: str, case_set: CaseSet):
+        expires = self._stored(case_set_id)
+
+        def write():
+            case_ids = zlib.compress("\n".join(case_set).encode())
+            self._write_conn.execute(
+                "INSERT OR REPLACE INTO case_sets VALUES (?, ?, ?)",
+                (case_set_id, case_ids, expires),
+            )
+
+        self._write(write)
+
+    def get_query(self, case_set_id: str) -> CaseQuery | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT query FROM case_queries WHERE case_set_id = ? AND expires > ?",
+                (case_set_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return CaseQuery(**json.loads(row[0]))
+
+    def put_query(self, case_set_id: str, query: CaseQuery):
+        expires = self._stored(case_set_id)
+        self._write(
+            self._write_conn.execute,
+            "INSERT OR REPLACE INTO case_queries VALUES (?, ?, ?)",
+            (case_set_id, json.dumps(asdict(query)), expires),
+        )
+
+    def get_lineage(self, handle: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT case_set_id FROM case_set_lineage WHERE handle = ?", (handle,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def put_lineage(self, handle: str, case_set_id: str):
+        self._write(
+            self._write_conn.execute,
+            "INSERT OR IGNORE INTO case_set_lineage VALUES (?, ?)",
+            (handle, case_set_id),
+        )
+
+    def touch(self, case_set_id: str):
+        touched = self._touched.get(case_set_id)
+        if (
+            touched is not None
+            and time.time() - touched < self.ttl * self.TOUCH_INTERVAL
+        ):
+            return
+        expires = self._stored(case_set_id)
+
+        def write():
+            for table in ["case_sets", "case_queries"]:
+                self._write_conn.execute(
+                    f"UPDATE {table} SET expires = ? WHERE case_set_id = ?",
+                    (expires, case_set_id),
+                )
+
+        self._write(write)
+
+    def purge_expired(self):
+        def write():
+            now = time.time()
+            for table in ["case_sets", "case_queries"]:
+                self._write_conn.execute(
+                    f"DELETE FROM {table} WHERE expires <= ?", (now,)
+                )
+
+        self._write(write)
+
+    def flush(self):
+        """
+        Waits for the queued writes to be committed.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def _stored(self, case_set_id: str) -> float:
+        now = time.time()
+        self._touched[case_set_id] = now
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            self._touched = {
+                k: t for k, t in self._touched.items() if now - t < self.ttl
+            }
+            self.purge_expired()
+        return now + self.ttl
+
+    def _write(self, fn, *args):
+        def commit():
+            with self._write_conn:
+                fn(*args)
+
+        self._writer.submit(commit).add_done_callback(_report_write_error)
+
+
+def _report_write_error(future: Future):
+    # nobody waits on the writes, so report failures instead of dropping them silently
+    if future.exception() is not None:
+        print(f"case store write failed: {future.exception()!r}", file=sys.stderr)
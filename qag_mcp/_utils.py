@@ -1,19 +1,77 @@
+import asyncio
+import functools
+import hashlib
 import inspect
+import os
+import re
+import string
 import sys
-from typing import Any
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Hashable, Literal, Mapping, TypeVar
 
-import requests
+import httpx
 
-from ._defines import GDC_API, TOOL_CACHE_ID_TEMPLATES, CaseSetId
+from ._defines import (
+    CASE_SET_HANDLE_TEMPLATE,
+    GDC_API,
+    TOOL_CACHE_ID_TEMPLATES,
+    CaseSetId,
+)
+from ._metrics import Counter, Histogram, query_counters
+from ._recording import GDCRecording
 
+T = TypeVar("T")
 
-def get_tool_case_set_id_template() -> str:
-    frame = inspect.currentframe().f_back
-    return TOOL_CACHE_ID_TEMPLATES[frame.f_code.co_name]
+_in_flight: dict[Hashable, asyncio.Future] = {}
+single_flight_stats = {"calls": 0, "coalesced": 0}
+
+
+async def single_flight(key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Runs `fn()` unless a call with the same key is already in flight, in which case its result is awaited instead.
+    This way concurrent identical retrievals share a single fetch and all waiters receive its result (or error).
+    """
+    single_flight_stats["calls"] += 1
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        single_flight_stats["coalesced"] += 1
+    # shield the shared task so that one cancelled waiter doesn't cancel it for everyone else
+    return await asyncio.shield(task)
+
+
+# tools returning case set IDs by name, so a case set can be recomputed by calling the tool encoded in its ID
+case_set_tools: dict[str, Callable[..., Awaitable[CaseSetId]]] = {}
+
+
+def case_set_tool(
+    tool: Callable[..., Awaitable[CaseSetId]],
+) -> Callable[..., Awaitable[CaseSetId]]:
+    """
+    Registers a tool whose case set IDs follow its template in `TOOL_CACHE_ID_TEMPLATES`.
+    The template is looked up and checked against the tool's parameters once, here, and bound to the tool as
+    `tool.format_case_set_id(**params)`, so no caller introspection is needed per call
+    and the binding survives wrapping the tool (e.g. with `functools.wraps`).
+    """
+    template = TOOL_CACHE_ID_TEMPLATES[tool.__name__]
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    missing = fields - inspect.signature(tool).parameters.keys()
+    if missing:
+        raise TypeError(
+            f"{tool.__name__} has no parameters {sorted(missing)} for its case set ID template {template!r}"
+        )
+
+    tool.format_case_set_id = template.format
+    case_set_tools[tool.__name__] = tool
+    return tool
 
 
 def suggest_tool_from_case_set_id(case_set_id: CaseSetId) -> str:
-    match = match_template_and_params(case_set_id, TOOL_CACHE_ID_TEMPLATES)
+    match = match_case_set_id(case_set_id)
     if match is not None:
         tool_name, tool_params = match
         tool_args = ", ".join([f"{k}={v}" for k, v in tool_params.items()])
@@ -28,21 +86,213 @@ def suggest_tool_from_case_set_id(case_set_id: CaseSetId) -> str:
     )
 
 
-def match_template_and_params(
-    identifier: str, templates: dict[str, str]
-) -> tuple[str, dict[str, str]] | None:
-    for func_name, template in templates.items():
-        prefix = template.split("-(")[0]
-        if identifier.startswith(prefix):
-            params = extract_top_level_params(identifier)
-            names = extract_top_level_params(template)
-            if len(params) != len(names):
+# set operations that are commutative and associative, so their case set IDs can be canonicalized
+SET_OPERATION_TOOLS = ("compute_case_intersection", "compute_case_union")
+
+
+@functools.lru_cache(maxsize=4096)
+def canonicalize_case_set_id(case_set_id: CaseSetId) -> CaseSetId:
+    """
+    Rewrites the ID of an intersection or union into a canonical form so that equivalent expressions
+    share a single cache entry: nested operations of the same kind are flattened, the operands are
+    canonicalized, deduplicated and sorted, then nested left to right again, for example
+    `Cases-Intersect-(B)-(Cases-Intersect-(C)-(A))` -> `Cases-Intersect-(Cases-Intersect-(A)-(B))-(C)`.
+    IDs of retrieval tools (and unparseable IDs) are returned unchanged.
+    """
+    try:
+        parsed = parse_case_set_id(case_set_id)
+    except (ValueError, IndexError):
+        return case_set_id
+    if parsed is None:
+        return case_set_id
+    return _canonicalize_parsed(parsed)
+
+
+def _canonicalize_parsed(parsed: "ParsedCaseSetId | str") -> CaseSetId:
+    if isinstance(parsed, str):
+        return parsed
+    if parsed.tool_name not in SET_OPERATION_TOOLS:
+        return parsed.case_set_id
+
+    tool_name = parsed.tool_name
+    prefix = TOOL_CACHE_ID_TEMPLATES[tool_name].split("-(")[0]
+    operands = set()
+    stack = list(parsed.params.values())
+    while stack:
+        operand = stack.pop()
+        if isinstance(operand, ParsedCaseSetId) and operand.tool_name == tool_name:
+            stack.extend(operand.params.values())
+            continue
+
+        operand = _canonicalize_parsed(operand)
+        # an operation of the other kind may have collapsed into one of this kind, e.g. (A ∩ B) ∪ (A ∩ B)
+        if operand.startswith(prefix):
+            operand_match = match_case_set_id(operand)
+            if operand_match is not None and operand_match[0] == tool_name:
+                stack.extend(operand_match[1].values())
+                continue
+        operands.add(operand)
+
+    return nest_set_operation(tool_name, sorted(operands))
+
+
+def nest_set_operation(tool_name: str, case_set_ids: list[CaseSetId]) -> CaseSetId:
+    # a set operation over a single case set is just that case set (e.g. A ∩ A = A)
+    template = TOOL_CACHE_ID_TEMPLATES[tool_name]
+    case_set_id = case_set_ids[0]
+    for operand in case_set_ids[1:]:
+        case_set_id = template.format(case_set_id_A=case_set_id, case_set_id_B=operand)
+    return case_set_id
+
+
+CASE_SET_HANDLE_PATTERN = re.compile(
+    re.escape(CASE_SET_HANDLE_TEMPLATE).replace(r"\{digest\}", "[0-9a-f]+")
+)
+
+
+def make_case_set_handle(case_set_id: CaseSetId) -> CaseSetId:
+    """
+    Short content addressed handle for a (canonical) case set ID, so equal IDs always get the same handle.
+    """
+    digest = hashlib.sha256(case_set_id.encode()).hexdigest()[:16]
+    return CASE_SET_HANDLE_TEMPLATE.format(digest=digest)
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedCaseSetId:
+    """
+    A parsed identifier, parameters that are identifiers themselves are parsed as well.
+    """
+
+    case_set_id: str
+    tool_name: str
+    params: dict[str, "ParsedCaseSetId | str"]
+
+
+class CaseSetIdMatcher:
+    """
+    Parses identifiers built from a set of templates back into the template's name and parameters.
+    The template prefixes are compiled into a single regex alternation, so picking the template is
+    one anchored match (the regex compiler factors out shared prefixes like `Cases-`), and the
+    parameters are extracted in a single scan over the closing parens following the prefix.
+    """
+
+    _PARENS = re.compile(r"[()]")
+
+    def __init__(self, templates: dict[str, str]):
+        self.templates = templates
+        self._names = []
+        self._params = []
+        alternatives = []
+        for i, (name, template) in enumerate(templates.items()):
+            self._names.append(name)
+            self._params.append(
+                [p.strip("{}") for p in extract_top_level_params(template)]
+            )
+            # templates are tried in order, as the first matching prefix wins
+            prefix = template.split("-(")[0]
+            alternatives.append(f"(?P<t{i}>{re.escape(prefix)})")
+        self._prefixes = re.compile("|".join(alternatives))
+
+    def match(self, identifier: str) -> tuple[str, Mapping[str, str]] | None:
+        match = self._prefixes.match(identifier)
+        if match is None:
+            return None
+
+        i = int(match.lastgroup[1:])
+        names = self._params[i]
+        params = self._extract_params(identifier, match.end())
+        if len(params) != len(names):
+            raise ValueError(
+                f"Number of parameters ({len(names)}) in matched template ({self.templates[self._names[i]]}) "
+                f"does not match the number of parameters ({len(params)}) in the identifier ({identifier})"
+            )
+        # read only, so that cached matches can be shared between callers
+        return (self._names[i], MappingProxyType(dict(zip(names, params))))
+
+    def parse(self, identifier: str) -> "ParsedCaseSetId | None":
+        """
+        Like `match`, but parameters that are identifiers themselves are parsed as well, recursively,
+        all within a single scan over the parens of the identifier.
+        """
+        # open parens, each with the parsed groups directly nested within it
+        stack = []
+        top_level = []
+        for paren in self._PARENS.finditer(identifier):
+            i = paren.start()
+            if identifier[i] == "(":
+                stack.append((i, []))
+            else:
+                if not stack:
+                    raise IndexError("No matching closing parens at: " + str(i))
+                opening_idx, groups = stack.pop()
+                group = self._parse_group(identifier, opening_idx + 1, i, groups)
+                (stack[-1][1] if stack else top_level).append(group)
+
+        if stack:
+            raise IndexError("No matching opening parens at: " + str(stack.pop()[0]))
+
+        if self._prefixes.match(identifier) is None:
+            return None
+        return self._parse_group(identifier, 0, len(identifier), top_level, strict=True)
+
+    def _parse_group(
+        self,
+        identifier: str,
+        start: int,
+        end: int,
+        groups: list,
+        strict: bool = False,
+    ) -> "ParsedCaseSetId | str":
+        match = self._prefixes.match(identifier, start, end)
+        if match is not None:
+            i = int(match.lastgroup[1:])
+            names = self._params[i]
+            if len(groups) == len(names):
+                return ParsedCaseSetId(
+                    case_set_id=identifier[start:end],
+                    tool_name=self._names[i],
+                    params=dict(zip(names, groups)),
+                )
+            if strict:
                 raise ValueError(
-                    f"Number of parameters ({len(names)}) in matched template ({template}) "
-                    f"does not match the number of parameters ({len(params)}) in the identifier ({identifier})"
+                    f"Number of parameters ({len(names)}) in matched template ({self.templates[self._names[i]]}) "
+                    f"does not match the number of parameters ({len(groups)}) in the identifier ({identifier})"
                 )
-            return (func_name, {n.strip("{}"): p for n, p in zip(names, params)})
-    return None
+        # a plain parameter value, e.g. a gene, which may happen to contain parens
+        return identifier[start:end]
+
+    def _extract_params(self, identifier: str, pos: int) -> list[str]:
+        # same as `extract_top_level_params`, but only the closing parens are visited in python,
+        # the opening parens before each of them are counted by `str.count`
+        params = []
+        start = identifier.find("(", pos)
+        while start != -1:
+            # depth is at least 1 until the group's own paren is closed, as the parens opened
+            # before a closing paren are counted before it
+            depth = 1
+            i = start + 1
+            while depth:
+                end = identifier.find(")", i)
+                if end == -1:
+                    raise IndexError("No matching opening parens at: " + str(start))
+                depth += identifier.count("(", i, end) - 1
+                i = end + 1
+            params.append(identifier[start + 1 : end])
+
+            start = identifier.find("(", i)
+            stray = identifier.find(")", i, len(identifier) if start == -1 else start)
+            if stray != -1:
+                raise IndexError("No matching closing parens at: " + str(stray))
+
+        return params
+
+
+def match_template_and_params(
+    identifier: str, templates: dict[str, str]
+) -> tuple[str, Mapping[str, str]] | None:
+    # case set IDs should use `match_case_set_id`, which doesn't recompile the templates every call
+    return CaseSetIdMatcher(templates).match(identifier)
 
 
 def extract_top_level_params(identifier: str) -> list[str]:
@@ -65,46 +315,337 @@ def extract_top_level_params(identifier: str) -> list[str]:
     return params
 
 
-def gdc_query_all(
+case_set_id_matcher = CaseSetIdMatcher(TOOL_CACHE_ID_TEMPLATES)
+# the same (sub)IDs get parsed over and over, e.g. by every set operation using them, so keep recent matches around
+match_case_set_id = functools.lru_cache(maxsize=4096)(case_set_id_matcher.match)
+parse_case_set_id = case_set_id_matcher.parse
+
+
+@dataclass
+class GDCClientConfig:
+    # base URL of the GDC API, overridable with the GDC_API environment variable,
+    # e.g. to point at a local stand-in for offline benchmarking (see `benchmarks/mock_gdc.py`)
+    api_url: str = field(default_factory=lambda: os.environ.get("GDC_API", GDC_API))
+    # connections kept open to the GDC API, this bounds concurrent requests,
+    # once all of them are busy further requests wait for a free connection
+    pool_maxsize: int = 16
+    # reuse connections across requests, disabling this forces a new TCP+TLS handshake per request
+    keep_alive: bool = True
+    # concurrent page requests per retrieval once the first page reports the total, 1 fetches pages serially
+    max_workers: int = 1
+    # seconds an idle keep-alive connection is held open
+    keepalive_expiry: float = 5.0
+    # seconds to wait on the GDC API before giving up, None waits indefinitely
+    timeout: float | None = None
+    # `in` filters with more values than this are split into chunks queried separately
+    max_in_values: int = 1000
+
+
+gdc_client_config = GDCClientConfig()
+# the async client is bound to the event loop it was first used in
+_gdc_async_client: httpx.AsyncClient | None = None
+_gdc_async_client_loop: asyncio.AbstractEventLoop | None = None
+# closes of replaced clients scheduled on their event loop, kept until they're done
+_closing_async_clients: set = set()
+_async_connection_stats = {"requests": 0, "connections_opened": 0}
+gdc_recording: GDCRecording | None = None
+
+gdc_requests = Counter(
+    "qag_mcp_gdc_requests_total",
+    "GDC API requests sent, by endpoint.",
+    ("endpoint",),
+)
+gdc_request_errors = Counter(
+    "qag_mcp_gdc_request_errors_total",
+    "GDC API requests that failed with an HTTP or connection error, by endpoint.",
+    ("endpoint",),
+)
+gdc_response_bytes = Counter(
+    "qag_mcp_gdc_response_bytes_total",
+    "Bytes of (decompressed) GDC API response bodies downloaded, by endpoint.",
+    ("endpoint",),
+)
+gdc_query_pages = Histogram(
+    "qag_mcp_gdc_query_pages",
+    "Pages requested per paged GDC API retrieval, by endpoint.",
+    ("endpoint",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+def configure_gdc_client(**kwargs) -> None:
+    """
+    Update the shared GDC client configuration, see `GDCClientConfig` for the options.
+    The pooled client is closed and rebuilt lazily on the next request with the new configuration.
+    """
+    for k, v in kwargs.items():
+        if not hasattr(gdc_client_config, k):
+            raise TypeError(f"Unknown GDC client option: {k}")
+        setattr(gdc_client_config, k, v)
+
+    _close_gdc_async_client()
+
+
+def _close_gdc_async_client() -> None:
+    global _gdc_async_client, _gdc_async_client_loop
+    client, loop = _gdc_async_client, _gdc_async_client_loop
+    _gdc_async_client = None
+    _gdc_async_client_loop = None
+    # the client can only be closed on its own event loop, once that is closed
+    # its connections can't be shut down cleanly anymore and are left to the garbage collector
+    if client is None or loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        closing = loop.create_task(client.aclose())
+    elif loop.is_running():
+        closing = asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    elif running is None:
+        loop.run_until_complete(client.aclose())
+        return
+    else:
+        return
+    _closing_async_clients.add(closing)
+    closing.add_done_callback(_closing_async_clients.discard)
+
+
+def get_gdc_async_client() -> httpx.AsyncClient:
+    """
+    Returns the `httpx.AsyncClient` used for GDC API calls from the running event loop.
+    Connections are pooled and kept alive so that paginated retrievals reuse a single TLS connection.
+    """
+    global _gdc_async_client, _gdc_async_client_loop
+    loop = asyncio.get_running_loop()
+    if _gdc_async_client is None or _gdc_async_client_loop is not loop:
+        # a client of another event loop can't be used from this one
+        _close_gdc_async_client()
+        keepalive = (
+            gdc_client_config.pool_maxsize if gdc_client_config.keep_alive else 0
+        )
+        _gdc_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=gdc_client_config.pool_maxsize,
+                max_keepalive_connections=keepalive,
+                keepalive_expiry=gdc_client_config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(gdc_client_config.timeout),
+        )
+        _gdc_async_client_loop = loop
+    return _gdc_async_client
+
+
+async def _trace_async_connections(event_name: str, info: dict) -> None:
+    # httpcore trace hook, fired for every step of a request's connection lifecycle
+    if event_name == "connection.connect_tcp.complete":
+        _async_connection_stats["connections_opened"] += 1
+
+
+def configure_gdc_recording(
+    path: str | None,
+    mode: Literal["record", "replay"] = "record",
+    latency: float = 0.0,
+) -> None:
+    """
+    Records GDC API responses to, or replays them from, the archive at `path`, see `GDCRecording`.
+    A path of None goes back to querying the GDC API without recording.
+    """
+    global gdc_recording
+    if gdc_recording is not None:
+        gdc_recording.close()
+    gdc_recording = None if path is None else GDCRecording(path, mode, latency)
+
+
+def get_gdc_recording_stats() -> dict[str, Any] | None:
+    return None if gdc_recording is None else gdc_recording.stats()
+
+
+def get_gdc_connection_stats() -> dict[str, int]:
+    """
+    Returns counters for the GDC connection pool: requests sent, connections opened,
+    and how many requests were served by reusing an already open connection.
+    """
+    stats = dict(_async_connection_stats)
+    stats["connections_reused"] = max(
+        stats["requests"] - stats["connections_opened"], 0
+    )
+    return stats
+
+
+def _gdc_payload(
+    filters: dict,
+    offset: int,
+    page_size: int,
+    fields: list[str] | None,
+) -> dict[str, Any]:
+    payload = {
+        "filters": filters,
+        "from": offset,
+        "size": page_size,
+    }
+
+    if fields:
+        # even if using post, fields needs to be a comma-separated string
+        payload["fields"] = ",".join(fields)
+
+    return payload
+
+
+def split_in_filters(filters: dict, max_in_values: int) -> list[dict]:
+    """
+    Splits every `in` value list longer than `max_in_values` into chunks, returning filters whose hits
+    together are the hits of the original filter. An `and` distributes over the union of the chunks of
+    its operands, so it needs one filter per combination of chunks. An `or` doesn't, so its i-th filter
+    only takes the i-th chunk of every split operand, and the operands that weren't split go along
+    with the first filter rather than being queried again with every chunk.
+    """
+    op = filters.get("op")
+    content = filters.get("content")
+    if op == "and":
+        split = [[]]
+        for f in content:
+            split = [
+                done + [chunk]
+                for done in split
+                for chunk in split_in_filters(f, max_in_values)
+            ]
+        return [{**filters, "content": c} for c in split]
+
+    if op == "or":
+        splits = [split_in_filters(f, max_in_values) for f in content]
+        split = [[] for _ in range(max(map(len, splits), default=1))]
+        for chunks in splits:
+            for i, chunk in enumerate(chunks):
+                split[i].append(chunk)
+        return [{**filters, "content": c} for c in split]
+
+    if op == "in" and len(content["value"]) > max_in_values:
+        values = content["value"]
+        return [
+            {**filters, "content": {**content, "value": values[i : i + max_in_values]}}
+            for i in range(0, len(values), max_in_values)
+        ]
+
+    return [filters]
+
+
+def _merge_chunk_hits(chunks: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    # a hit may match more than one chunk (e.g. beneath an `or`), so dedupe on the hit ID
+    all_hits = []
+    seen = set()
+    for hits in chunks:
+        for hit in hits:
+            hit_id = hit.get("id")
+            if hit_id is not None:
+                if hit_id in seen:
+                    continue
+                seen.add(hit_id)
+            all_hits.append(hit)
+    return all_hits
+
+
+async def _gdc_post_async(
+    client: httpx.AsyncClient, url: str, payload: dict
+) -> dict[str, Any]:
+    endpoint = url.rsplit("/", 1)[-1]
+    # replayed responses stand in for GDC requests
+    query_counters.inc("gdc_requests")
+    if gdc_recording is not None and gdc_recording.replaying:
+        return (await gdc_recording.replay_async(endpoint, payload))["data"]
+
+    _async_connection_stats["requests"] += 1
+    gdc_requests.inc(endpoint)
+    try:
+        response = await client.post(
+            url, json=payload, extensions={"trace": _trace_async_connections}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError:
+        gdc_request_errors.inc(endpoint)
+        raise
+    gdc_response_bytes.inc(endpoint, amount=len(response.content))
+    resp_json = response.json()
+    if gdc_recording is not None:
+        gdc_recording.record(endpoint, payload, resp_json)
+
+    if resp_json["warnings"]:
+        print(resp_json["warnings"], file=sys.stderr)
+
+    return resp_json["data"]
+
+
+async def gdc_query_all_async(
     endpoint: str,
     filters: dict,
     fields: list[str] | None = None,
     page_size: int = 1000,
+    max_workers: int | None = None,
 ) -> list[dict[str, Any]]:
-    url = f"{GDC_API}/{endpoint}"
-    all_hits = []
-    offset = 0
-
-    while True:
-        payload = {
-            "filters": filters,
-            "from": offset,
-            "size": page_size,
-        }
+    """
+    Retrieve all hits of a GDC API query, paging through the results.
+    The first page reports the total number of hits, after which up to `max_workers` of the remaining pages
+    (defaults to the client config) are fetched concurrently. Pages are stitched back together in offset order.
+    Requests are awaited on the running event loop, so concurrent tool calls are not blocked on the GDC API.
 
-        if fields:
-            # even if using post, fields needs to be a comma-separated string
-            payload["fields"] = ",".join(fields)
+    Oversized `in` value lists are split into chunks of at most `max_in_values` (see the client config),
+    the chunks are queried concurrently and their hits merged and deduplicated.
+    """
+    url = f"{gdc_client_config.api_url}/{endpoint}"
+    client = get_gdc_async_client()
+    if max_workers is None:
+        max_workers = gdc_client_config.max_workers
 
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        resp_json = response.json()
+    # a single semaphore bounds the concurrent requests across all chunks and pages of this query
+    semaphore = asyncio.Semaphore(max(max_workers, 1))
+    chunks = split_in_filters(filters, gdc_client_config.max_in_values)
+    chunk_results = await asyncio.gather(
+        *[
+            _gdc_query_pages_async(client, url, chunk, fields, page_size, semaphore)
+            for chunk in chunks
+        ]
+    )
+    gdc_query_pages.observe(sum(pages for _, pages in chunk_results), endpoint)
+    if len(chunk_results) == 1:
+        return chunk_results[0][0]
+    return _merge_chunk_hits([hits for hits, _ in chunk_results])
 
-        if resp_json["warnings"]:
-            print(resp_json["warnings"], file=sys.stderr)
 
-        data = resp_json["data"]
+async def _gdc_query_pages_async(
+    client: httpx.AsyncClient,
+    url: str,
+    filters: dict,
+    fields: list[str] | None,
+    page_size: int,
+    semaphore: asyncio.Semaphore,
+) -> tuple[list[dict[str, Any]], int]:
+    async def fetch_page(offset: int) -> dict[str, Any]:
+        async with semaphore:
+            return await _gdc_post_async(
+                client, url, _gdc_payload(filters, offset, page_size, fields)
+            )
 
-        hits = data["hits"]
-        all_hits.extend(hits)
+    data = await fetch_page(0)
+    all_hits = list(data["hits"])
+    total = data["pagination"]["total"]
 
-        pagination = data["pagination"]
-        total = pagination["total"]
+    # gather returns results in submission order, so hits stay in offset order
+    pages = await asyncio.gather(
+        *[fetch_page(offset) for offset in range(page_size, total, page_size)]
+    )
+    for data in pages:
+        all_hits.extend(data["hits"])
 
-        # print(f"Retrieved {len(all_hits)} / {total}", file=sys.stderr)
+    return all_hits, 1 + len(pages)
 
-        offset += page_size
-        if offset >= total:
-            break
 
-    return all_hits
+async def gdc_count_async(endpoint: str, filters: dict) -> int:
+    """
+    Retrieve only the number of hits of a GDC API query, without downloading any hits.
+    """
+    url = f"{gdc_client_config.api_url}/{endpoint}"
+    data = await _gdc_post_async(
+        get_gdc_async_client(), url, _gdc_payload(filters, 0, 0, None)
+    )
+    return data["pagination"]["total"]
@@ -1,31 +1,97 @@
 import argparse
+import asyncio
+import functools
 import json
+import re
 import sys
+import time
 
 from cachetools import TTLCache
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.exceptions import ToolError
+from mcp.server.lowlevel.server import request_ctx
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
+from ._cache import CaseCache, CaseQueryCache, CaseSetLineage
+from ._case_sets import CaseSet, case_id_table
 from ._defines import (
     AAChange,
     CaseCount,
     CaseSetId,
+    CaseSetIds,
     CNVChange,
     CohortDescription,
     Gene,
     MSIStatus,
     Project,
 )
+from ._metrics import (
+    QUERY_TAG_HEADER,
+    CallbackMetric,
+    Counter,
+    Histogram,
+    query_counters,
+    query_tag,
+    render_metrics,
+)
+from ._queries import (
+    CaseQuery,
+    count_cases,
+    fetch_case_ids,
+    intersect_case_queries,
+    union_case_queries,
+)
+from ._store import SQLiteCaseSetStore
 from ._utils import (
-    gdc_query_all,
-    get_tool_case_set_id_template,
+    CASE_SET_HANDLE_PATTERN,
+    canonicalize_case_set_id,
+    case_set_tool,
+    case_set_tools,
+    configure_gdc_client,
+    configure_gdc_recording,
+    gdc_client_config,
+    gdc_query_pages,
+    gdc_request_errors,
+    gdc_requests,
+    gdc_response_bytes,
+    get_gdc_connection_stats,
+    get_gdc_recording_stats,
+    make_case_set_handle,
+    match_case_set_id,
+    nest_set_operation,
+    single_flight,
+    single_flight_stats,
     suggest_tool_from_case_set_id,
 )
 
-case_cache = TTLCache(maxsize=1000, ttl=3600)
+# case sets are bounded by their memory footprint, see --case-cache-max-bytes
+case_cache = CaseCache(max_bytes=256 * 1024**2, ttl=3600)
+# queries of retrieved case sets whose members are only fetched once a set operation needs them
+case_queries = CaseQueryCache(maxsize=1000, ttl=3600)
+# sizes of case sets answered from query totals, without retrieving the members
+case_counts = TTLCache(maxsize=1000, ttl=3600)
+# set operations whose evaluation has been deferred, as the tool and IDs of their operands
+case_expressions = TTLCache(maxsize=10000, ttl=3600)
+# full case set IDs of the hashed handles returned in their place, see --compact-case-set-ids
+case_set_lineage = CaseSetLineage(maxsize=100000)
+compact_case_set_id_length = None
+
+
+async def retrieve_case_set(cache_id: CaseSetId, query: CaseQuery) -> CaseSet:
+    # keep the query around so later intersections can be pushed down to the GDC
+    case_queries[cache_id] = query
 
+    async def retrieve() -> CaseSet:
+        case_cache[cache_id] = CaseSet.from_case_ids(await fetch_case_ids(query))
+        return case_cache[cache_id]
 
-def get_simple_somatic_mutation_occurrences(
+    # concurrent retrievals of the same case set (e.g. from parallel sessions) share a single fetch
+    return await single_flight(cache_id, retrieve)
+
+
+@case_set_tool
+async def get_simple_somatic_mutation_occurrences(
     gene: Gene,
     aa_change: AAChange = None,
 ) -> CaseSetId:
@@ -39,19 +105,21 @@ def get_simple_somatic_mutation_occurrences(
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(gene=gene, aa_change=aa_change)
+    cache_id = get_simple_somatic_mutation_occurrences.format_case_set_id(
+        gene=gene, aa_change=aa_change
+    )
 
     # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
+    if get_cached_case_set_id(cache_id) is not None:
         return cache_id
 
-    # first get SSMs for the given query parameters, either by gene & AA change or just gene
+    # filter SSM occurrences directly on the nested SSM fields, either by gene & AA change or just gene,
+    # rather than first listing every matching SSM ID and sending them all back as an `in` filter
     if aa_change is not None:
         _filters = {
             "op": "in",
             "content": {
-                "field": "gene_aa_change",
+                "field": "ssm.gene_aa_change",
                 "value": [f"{gene} {aa_change}"],  # e.g. 'BRAF V600E'
             },
         }
@@ -59,36 +127,23 @@ def get_simple_somatic_mutation_occurrences(
         _filters = {
             "op": "in",
             "content": {
-                "field": "consequence.transcript.gene.symbol",
+                "field": "ssm.consequence.transcript.gene.symbol",
                 "value": [gene],
             },
         }
-    hits = gdc_query_all(
-        endpoint="ssms",
-        filters=_filters,
-        fields=["gene_aa_change", "ssm_id"],
-    )
-    ssm_ids = [hit["ssm_id"] for hit in hits]
-
-    # then get cases matching those SSMs
-    hits = gdc_query_all(
+    query = CaseQuery(
         endpoint="ssm_occurrences",
-        filters={
-            "op": "in",
-            "content": {
-                "field": "ssm.ssm_id",
-                "value": ssm_ids,
-            },
-        },
-        fields=["ssm.ssm_id", "case.submitter_id", "case.case_id"],
+        filters=_filters,
+        case_id_field="case.case_id",
     )
-    case_ids = set([hit["case"]["case_id"] for hit in hits])
-    case_cache[cache_id] = list(case_ids)
+    # defer retrieving the members until they are needed, see `get_case_set`
+    case_queries[cache_id] = query
 
     return cache_id
 
 
-def get_copy_number_variant_occurrences(
+@case_set_tool
+async def get_copy_number_variant_occurrences(
     gene: Gene,
     cnv_change: CNVChange = None,
 ) -> CaseSetId:
@@ -102,11 +157,12 @@ def get_copy_number_variant_occurrences(
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(gene=gene, cnv_change=cnv_change)
+    cache_id = get_copy_number_variant_occurrences.format_case_set_id(
+        gene=gene, cnv_change=cnv_change
+    )
 
     # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
+    if get_cached_case_set_id(cache_id) is not None:
         return cache_id
 
     # apparently `heterozygous deletion` change type is `loss` so remap it
@@ -135,27 +191,22 @@ def get_copy_number_variant_occurrences(
             }
         )
 
-    hits = gdc_query_all(
+    query = CaseQuery(
         endpoint="cnv_occurrences",
         filters={
             "op": "and",
             "content": ops,
         },
-        fields=[
-            "cnv.cnv_change",
-            "cnv.cnv_change_5_category",
-            "cnv.consequence.gene.symbol",
-            "case.submitter_id",
-            "case.case_id",
-        ],
+        case_id_field="case.case_id",
     )
-    case_ids = set([hit["case"]["case_id"] for hit in hits])
-    case_cache[cache_id] = list(case_ids)
+    # defer retrieving the members until they are needed, see `get_case_set`
+    case_queries[cache_id] = query
 
     return cache_id
 
 
-def get_microsatellite_instability_occurrences(
+@case_set_tool
+async def get_microsatellite_instability_occurrences(
     msi_status: MSIStatus = "msi",
 ) -> CaseSetId:
     """
@@ -168,15 +219,16 @@ def get_microsatellite_instability_occurrences(
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(msi_status=msi_status)
+    cache_id = get_microsatellite_instability_occurrences.format_case_set_id(
+        msi_status=msi_status
+    )
 
     # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
+    if get_cached_case_set_id(cache_id) is not None:
         return cache_id
 
     # MSI is stored at the file level, so we need to query the files and aggregate back up to the cases
-    hits = gdc_query_all(
+    query = CaseQuery(
         endpoint="files",
         filters={
             "op": "and",
@@ -185,24 +237,16 @@ def get_microsatellite_instability_occurrences(
                 {"op": "in", "content": {"field": "data_format", "value": ["BAM"]}},
             ],
         },
-        fields=[
-            "msi_status",
-            "msi_score",
-            "cases.submitter_id",
-            "cases.case_id",
-        ],
+        case_id_field="cases.case_id",
     )
-
-    case_ids = set()
-    for hit in hits:
-        for case in hit.get("cases", []):
-            case_ids.add(case["case_id"])
-    case_cache[cache_id] = list(case_ids)
+    # defer retrieving the members until they are needed, see `get_case_set`
+    case_queries[cache_id] = query
 
     return cache_id
 
 
-def get_cases_by_project(project: Project) -> CaseSetId:
+@case_set_tool
+async def get_cases_by_project(project: Project) -> CaseSetId:
     """
     A tool to query the GDC API for cases of a project, for example 'TCGA-BRCA'.
     The resulting case set is cached server side and can be referenced using the unique identifier returned by this tool.
@@ -212,14 +256,15 @@ def get_cases_by_project(project: Project) -> CaseSetId:
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(project=project)
+    cache_id = get_cases_by_project.format_case_set_id(project=project)
 
     # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
+    if get_cached_case_set_id(cache_id) is not None:
         return cache_id
 
-    hits = gdc_query_all(
+    # the cases endpoint can count matching cases without downloading them,
+    # so the members may never need to be retrieved at all
+    case_queries[cache_id] = CaseQuery(
         endpoint="cases",
         filters={
             "op": "in",
@@ -228,10 +273,8 @@ def get_cases_by_project(project: Project) -> CaseSetId:
                 "value": [project],
             },
         },
-        fields=["project.project_id", "submitter_id"],
+        case_id_field="case_id",
     )
-    case_ids = set([hit["id"] for hit in hits])
-    case_cache[cache_id] = list(case_ids)
 
     return cache_id
 
@@ -240,7 +283,8 @@ def make_cohort_copilot_tool(generate_filter):
     # The method to generate_filter should be modular so that improvements to cohort copilot
     # can be reflected simply by using a revised implementation of generate_filter
 
-    def get_cases_by_cohort_description(
+    @case_set_tool
+    async def get_cases_by_cohort_description(
         cohort_description: CohortDescription,
     ) -> CaseSetId:
         """
@@ -254,34 +298,264 @@ def make_cohort_copilot_tool(generate_filter):
             file=sys.stderr,
         )
 
-        cache_id = get_tool_case_set_id_template().format(
+        cache_id = get_cases_by_cohort_description.format_case_set_id(
             cohort_description=cohort_description
         )
 
-        # if we've already done this retrieval, refresh it in the cache and shortcut return
-        if cache_id in case_cache:
-            case_cache[cache_id] = case_cache[cache_id]
+        # if we've already done this retrieval or generated the filter for this cohort, shortcut return
+        if get_cached_case_set_id(cache_id) is not None:
             return cache_id
 
-        filter_str = generate_filter(cohort_description)
+        # filter generation runs a local model, keep it off the event loop
+        # and share it between concurrent calls for the same cohort
+        filter_str = await single_flight(
+            ("cohort", cohort_description),
+            lambda: asyncio.to_thread(generate_filter, cohort_description),
+        )
 
         # NOTE: there's not a great way in the current tool design to surface the cohort filter to the user, for now just print it
         print(f"Generated Cohort Filter:\n{filter_str}", file=sys.stderr)
 
-        hits = gdc_query_all(
+        # as with projects, defer retrieving the members until they are needed
+        case_queries[cache_id] = CaseQuery(
             endpoint="cases",
             filters=json.loads(filter_str),
-            fields=["submitter_id"],
+            case_id_field="case_id",
         )
-        case_ids = set([hit["id"] for hit in hits])
-        case_cache[cache_id] = list(case_ids)
 
         return cache_id
 
     return get_cases_by_cohort_description
 
 
-def compute_case_intersection(
+def compact_case_set_id(case_set_id: CaseSetId) -> CaseSetId:
+    """
+    Returns a short hashed handle in place of a long case set ID, if enabled with --compact-case-set-ids.
+    The full ID is kept in the lineage table, so the handle can always be expanded back to it.
+    """
+    if (
+        compact_case_set_id_length is None
+        or len(case_set_id) <= compact_case_set_id_length
+    ):
+        return case_set_id
+    handle = make_case_set_handle(case_set_id)
+    case_set_lineage[handle] = case_set_id
+    return handle
+
+
+def expand_case_set_id(case_set_id: CaseSetId) -> CaseSetId:
+    """
+    Replaces any hashed handles within a case set ID with the full IDs they stand for.
+    """
+
+    def expand(match: re.Match) -> str:
+        handle = match.group(0)
+        if handle not in case_set_lineage:
+            raise ToolError(
+                f"Case set {handle} is unknown to this server. "
+                f"Try requerying for those cases and recomputing any set operations on them."
+            )
+        return case_set_lineage[handle]
+
+    return CASE_SET_HANDLE_PATTERN.sub(expand, case_set_id)
+
+
+def raise_case_set_not_found(case_set_id: CaseSetId):
+    raise ToolError(
+        f"Case set {case_set_id} was not found in the server side cache, perhaps it expired? "
+        f"Try requerying for those cases to cache it again. {suggest_tool_from_case_set_id(case_set_id)}"
+    )
+
+
+async def recompute_case_set(case_set_id: CaseSetId):
+    """
+    Recomputes an expired case set (or one this server has never seen) by calling the tool with the
+    arguments encoded in its ID, which recurses into the operands of set operations as needed.
+    Expiry then only costs the GDC retrievals instead of a round trip through the agent.
+    """
+    try:
+        match = match_case_set_id(case_set_id)
+    except (ValueError, IndexError):
+        match = None
+    if match is None or match[0] not in case_set_tools:
+        raise_case_set_not_found(case_set_id)
+
+    tool_name, tool_params = match
+    # IDs of tools called without an optional argument encode it as 'None'
+    tool_params = {k: None if v == "None" else v for k, v in tool_params.items()}
+    await case_set_tools[tool_name](**tool_params)
+
+
+async def get_case_set(case_set_id: CaseSetId) -> CaseSet:
+    """
+    Returns the cached members of a case set, evaluating and retrieving them first if they were deferred.
+    """
+    case_set = case_cache.lookup(case_set_id)
+    if case_set is not None:
+        # refresh the set since we're using it
+        case_cache[case_set_id] = case_set
+        return case_set
+
+    return await materialize_case_set(case_set_id)
+
+
+async def materialize_case_set(case_set_id: CaseSetId) -> CaseSet:
+    # the members of a case set that isn't cached, by evaluating and retrieving it
+    await plan_case_set(case_set_id)
+    if case_set_id in case_cache:
+        return case_cache[case_set_id]
+
+    return await retrieve_case_set(case_set_id, case_queries[case_set_id])
+
+
+async def ensure_case_set(case_set_id: CaseSetId):
+    # make sure the case set is either cached, deferred or a pending set operation, recomputing it if it expired
+    if (
+        case_set_id not in case_cache
+        and case_set_id not in case_queries
+        and case_set_id not in case_expressions
+    ):
+        await recompute_case_set(case_set_id)
+
+
+async def plan_case_set(case_set_id: CaseSetId):
+    """
+    Makes sure a case set is either cached or has a single query that retrieves it.
+    Pending set operations are evaluated here, once the whole expression beneath them is known,
+    so their operands can be pushed down to the GDC together rather than one tool call at a time.
+    """
+    await ensure_case_set(case_set_id)
+    if case_set_id in case_cache or case_set_id in case_queries:
+        return
+
+    tool_name, case_set_ids = case_expressions[case_set_id]
+    evaluate = set_operation_evaluators[tool_name]
+    await single_flight(
+        ("evaluate", case_set_id), lambda: evaluate(case_set_id, case_set_ids)
+    )
+
+
+async def defer_set_operation(
+    tool_name: str, cache_id: CaseSetId, case_set_ids: list[CaseSetId]
+):
+    # only check that the operands exist (recomputing them if needed), evaluation waits for a consumer
+    await asyncio.gather(*[ensure_case_set(c) for c in case_set_ids])
+    # operations on a single distinct case set are that case set
+    if cache_id not in case_set_ids:
+        case_expressions[cache_id] = (tool_name, case_set_ids)
+
+
+def get_cached_case_set_id(cache_id: CaseSetId) -> CaseSetId | None:
+    # if we've already done this computation, refresh it in the cache and shortcut return
+    if cache_id in case_cache:
+        case_cache[cache_id] = case_cache[cache_id]
+        return cache_id
+    if cache_id in case_queries:
+        case_queries[cache_id] = case_queries[cache_id]
+        return cache_id
+    if cache_id in case_expressions:
+        case_expressions[cache_id] = case_expressions[cache_id]
+        return cache_id
+    return None
+
+
+async def evaluate_case_intersection(
+    cache_id: CaseSetId, case_set_ids: list[CaseSetId]
+) -> CaseSetId:
+    """
+    Computes the intersection of the given case sets and caches it under `cache_id`.
+    Operands that haven't been retrieved yet are combined into as few GDC queries as possible,
+    ideally one, and everything else is intersected in memory starting from the smallest set.
+    """
+    await asyncio.gather(*[plan_case_set(c) for c in case_set_ids])
+
+    in_memory = [c for c in case_set_ids if c in case_cache]
+    deferred = [c for c in case_set_ids if c not in case_cache]
+
+    # have the GDC evaluate the conjunction of as many deferred operands as possible with a single combined filter,
+    # any number of case level queries can be combined with at most one occurrence level query
+    query = None
+    pushed_down = []
+    not_pushed_down = []
+    for case_set_id in deferred:
+        combined = case_queries[case_set_id]
+        if query is not None:
+            combined = intersect_case_queries(query, combined)
+        if combined is None:
+            not_pushed_down.append(case_set_id)
+        else:
+            query = combined
+            pushed_down.append(case_set_id)
+
+    if query is not None and query.counts_cases:
+        # rather than downloading every case of the case level queries, push them into the query of an
+        # operand that's already in memory (e.g. SSM-in-gene ∩ Project only downloads cases of that project with the SSM)
+        candidates = [c for c in in_memory if c in case_queries]
+        if candidates:
+            case_set_id = min(candidates, key=lambda c: len(case_cache[c]))
+            combined = intersect_case_queries(case_queries[case_set_id], query)
+            if combined is not None:
+                query = combined
+                in_memory.remove(case_set_id)
+                pushed_down.append(case_set_id)
+
+    if query is not None:
+        pushed_down_id = canonicalize_case_set_id(
+            nest_set_operation("compute_case_intersection", sorted(pushed_down))
+        )
+        if pushed_down_id == cache_id:
+            # the whole intersection is a single query, which can be deferred like any other
+            case_queries[cache_id] = query
+            return cache_id
+
+    case_sets = [await get_case_set(c) for c in in_memory]
+    case_sets += await asyncio.gather(*[get_case_set(c) for c in not_pushed_down])
+    if query is not None:
+        # cache the pushed down part under its own ID, it's a valid subresult
+        case_sets.append(await retrieve_case_set(pushed_down_id, query))
+
+    # smallest first, so intermediate results stay small and an empty set ends the evaluation early
+    case_sets.sort(key=len)
+    result = case_sets[0]
+    for case_set in case_sets[1:]:
+        if len(result) == 0:
+            break
+        result = result & case_set
+    case_cache[cache_id] = result
+
+    return cache_id
+
+
+async def evaluate_case_union(
+    cache_id: CaseSetId, case_set_ids: list[CaseSetId]
+) -> CaseSetId:
+    """
+    Computes the union of the given case sets and caches it under `cache_id`.
+    """
+    await asyncio.gather(*[plan_case_set(c) for c in case_set_ids])
+
+    # a union of case level queries is itself a case level query, so it can be deferred as well
+    if all(c not in case_cache for c in case_set_ids):
+        query = case_queries[case_set_ids[0]]
+        for case_set_id in case_set_ids[1:]:
+            if query is None:
+                break
+            query = union_case_queries(query, case_queries[case_set_id])
+        if query is not None:
+            case_queries[cache_id] = query
+            return cache_id
+
+    case_sets = await asyncio.gather(*[get_case_set(c) for c in case_set_ids])
+    result = case_sets[0]
+    for case_set in case_sets[1:]:
+        result = result | case_set
+    case_cache[cache_id] = result
+
+    return cache_id
+
+
+@case_set_tool
+async def compute_case_intersection(
     case_set_id_A: CaseSetId,
     case_set_id_B: CaseSetId,
 ) -> CaseSetId:
@@ -294,34 +568,27 @@ def compute_case_intersection(
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(
-        case_set_id_A=case_set_id_A, case_set_id_B=case_set_id_B
-    )
-
-    # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
-        return cache_id
+    # operands are stored and looked up under their canonical IDs, like the results of the set tools
+    case_set_id_A = canonicalize_case_set_id(expand_case_set_id(case_set_id_A))
+    case_set_id_B = canonicalize_case_set_id(expand_case_set_id(case_set_id_B))
 
-    for case_set_id in [case_set_id_A, case_set_id_B]:
-        if case_set_id not in case_cache:
-            raise ToolError(
-                f"Case set {case_set_id} was not found in the server side cache, perhaps it expired? "
-                f"Try requerying for those cases to cache it again. {suggest_tool_from_case_set_id(case_set_id)}"
-            )
-        # refresh the subsets since we're using them
-        case_cache[case_set_id] = case_cache[case_set_id]
-
-    cases_A = set(case_cache[case_set_id_A])
-    cases_B = set(case_cache[case_set_id_B])
+    # equivalent expressions (e.g. A ∩ B and B ∩ A) share one canonical ID and cache entry
+    cache_id = canonicalize_case_set_id(
+        compute_case_intersection.format_case_set_id(
+            case_set_id_A=case_set_id_A, case_set_id_B=case_set_id_B
+        )
+    )
 
-    A_and_B = cases_A & cases_B
-    case_cache[cache_id] = list(A_and_B)
+    if get_cached_case_set_id(cache_id) is None:
+        await defer_set_operation(
+            "compute_case_intersection", cache_id, [case_set_id_A, case_set_id_B]
+        )
 
-    return cache_id
+    return compact_case_set_id(cache_id)
 
 
-def compute_case_union(
+@case_set_tool
+async def compute_case_union(
     case_set_id_A: CaseSetId,
     case_set_id_B: CaseSetId,
 ) -> CaseSetId:
@@ -334,34 +601,83 @@ def compute_case_union(
         file=sys.stderr,
     )
 
-    cache_id = get_tool_case_set_id_template().format(
-        case_set_id_A=case_set_id_A, case_set_id_B=case_set_id_B
+    # operands are stored and looked up under their canonical IDs, like the results of the set tools
+    case_set_id_A = canonicalize_case_set_id(expand_case_set_id(case_set_id_A))
+    case_set_id_B = canonicalize_case_set_id(expand_case_set_id(case_set_id_B))
+
+    # equivalent expressions (e.g. A ∪ B and B ∪ A) share one canonical ID and cache entry
+    cache_id = canonicalize_case_set_id(
+        compute_case_union.format_case_set_id(
+            case_set_id_A=case_set_id_A, case_set_id_B=case_set_id_B
+        )
     )
 
-    # if we've already done this retrieval, refresh it in the cache and shortcut return
-    if cache_id in case_cache:
-        case_cache[cache_id] = case_cache[cache_id]
-        return cache_id
+    if get_cached_case_set_id(cache_id) is None:
+        await defer_set_operation(
+            "compute_case_union", cache_id, [case_set_id_A, case_set_id_B]
+        )
+
+    return compact_case_set_id(cache_id)
 
-    for case_set_id in [case_set_id_A, case_set_id_B]:
-        if case_set_id not in case_cache:
-            raise ToolError(
-                f"Case set {case_set_id} was not found in the server side cache, perhaps it expired? "
-                f"Try requerying for those cases to cache it again. {suggest_tool_from_case_set_id(case_set_id)}"
-            )
-        # refresh the subsets since we're using them
-        case_cache[case_set_id] = case_cache[case_set_id]
 
-    cases_A = set(case_cache[case_set_id_A])
-    cases_B = set(case_cache[case_set_id_B])
+async def compute_multi_case_intersection(
+    case_set_ids: CaseSetIds,
+) -> CaseSetId:
+    """
+    A tool to compute the intersection of two or more case sets in a single call,
+    for example cases with a mutation in one gene, cases with a mutation in another gene, and cases of a project.
+    Prefer this tool over chaining multiple calls to compute_case_intersection.
+    The resulting intersected case set is cached server side and can be referenced using the unique identifier returned by this tool.
+    """
+    print(
+        f"compute_multi_case_intersection(case_set_ids={repr(case_set_ids)})",
+        file=sys.stderr,
+    )
 
-    A_and_B = cases_A | cases_B
-    case_cache[cache_id] = list(A_and_B)
+    case_set_ids = list(
+        dict.fromkeys(
+            canonicalize_case_set_id(expand_case_set_id(c)) for c in case_set_ids
+        )
+    )
+    cache_id = canonicalize_case_set_id(
+        nest_set_operation("compute_case_intersection", case_set_ids)
+    )
+
+    if get_cached_case_set_id(cache_id) is None:
+        await defer_set_operation("compute_case_intersection", cache_id, case_set_ids)
+
+    return compact_case_set_id(cache_id)
 
-    return cache_id
 
+async def compute_multi_case_union(
+    case_set_ids: CaseSetIds,
+) -> CaseSetId:
+    """
+    A tool to compute the union of two or more case sets in a single call.
+    Prefer this tool over chaining multiple calls to compute_case_union.
+    The resulting unioned case set is cached server side and can be referenced using the unique identifier returned by this tool.
+    """
+    print(
+        f"compute_multi_case_union(case_set_ids={repr(case_set_ids)})",
+        file=sys.stderr,
+    )
+
+    case_set_ids = list(
+        dict.fromkeys(
+            canonicalize_case_set_id(expand_case_set_id(c)) for c in case_set_ids
+        )
+    )
+    cache_id = canonicalize_case_set_id(
+        nest_set_operation("compute_case_union", case_set_ids)
+    )
+
+    if get_cached_case_set_id(cache_id) is None:
+        await defer_set_operation("compute_case_union", cache_id, case_set_ids)
+
+    return compact_case_set_id(cache_id)
 
-def get_case_set_size(
+
+async def get_case_set_size(
     case_set_id: CaseSetId,
 ) -> CaseCount:
     """
@@ -373,16 +689,157 @@ def get_case_set_size(
         file=sys.stderr,
     )
 
-    if case_set_id not in case_cache:
-        raise ToolError(
-            f"Case set {case_set_id} was not found in the server side cache, perhaps it expired? "
-            f"Try requerying for those cases to cache it again. {suggest_tool_from_case_set_id(case_set_id)}"
-        )
+    case_set_id = canonicalize_case_set_id(expand_case_set_id(case_set_id))
+
+    case_set = case_cache.lookup(case_set_id)
+    if case_set is not None:
+        # refresh the subsets since we're using them
+        case_cache[case_set_id] = case_set
+        return len(case_set)
+
+    if case_set_id in case_counts:
+        case_counts[case_set_id] = case_counts[case_set_id]
+        return case_counts[case_set_id]
+
+    # evaluate as little as possible, ideally down to a single query on the cases endpoint
+    await plan_case_set(case_set_id)
+    if case_set_id in case_cache:
+        return len(case_cache[case_set_id])
+
+    case_queries[case_set_id] = case_queries[case_set_id]
+    query = case_queries[case_set_id]
+    if not query.counts_cases:
+        # counting cases of occurrence level hits needs their case IDs anyway, so keep them
+        return len(await materialize_case_set(case_set_id))
+
+    # the members of this case set haven't been needed yet, so answer from the query's totals
+    case_counts[case_set_id] = await single_flight(
+        ("count", case_set_id), lambda: count_cases(query)
+    )
+
+    return case_counts[case_set_id]
+
+
+# how to evaluate the pending set operations of `case_expressions`, by the tool that deferred them
+set_operation_evaluators = {
+    "compute_case_intersection": evaluate_case_intersection,
+    "compute_case_union": evaluate_case_union,
+}
+
+
+async def get_server_stats(request: Request) -> JSONResponse:
+    # not a tool, served over HTTP alongside the MCP endpoint for monitoring
+    stats = {
+        "case_cache": case_cache.stats(),
+        "interned_case_ids": {
+            "entries": len(case_id_table),
+            "bytes": sys.getsizeof(case_id_table),
+        },
+        "gdc_connections": get_gdc_connection_stats(),
+        "gdc_recording": get_gdc_recording_stats(),
+        "single_flight": single_flight_stats,
+    }
+    # e.g. /stats?query_tag=... for the counters of the tool calls tagged with QUERY_TAG_HEADER
+    tag = request.query_params.get("query_tag")
+    if tag is not None:
+        stats["query"] = query_counters.get(tag)
+    return JSONResponse(stats)
+
+
+tool_calls = Counter(
+    "qag_mcp_tool_calls_total",
+    "MCP tool calls, by tool and whether they returned or raised.",
+    ("tool", "status"),
+)
+tool_latency = Histogram(
+    "qag_mcp_tool_latency_seconds",
+    "Latency of MCP tool calls, by tool.",
+    ("tool",),
+)
 
-    # refresh the subsets since we're using them
-    case_cache[case_set_id] = case_cache[case_set_id]
 
-    return len(case_cache[case_set_id])
+def get_request_query_tag() -> str | None:
+    try:
+        request = request_ctx.get().request
+    except LookupError:
+        return None
+    # only HTTP transports have a request with headers, not stdio
+    headers = getattr(request, "headers", None)
+    return None if headers is None else headers.get(QUERY_TAG_HEADER)
+
+
+def instrument_tool(tool):
+    """
+    Records the call count and latency of an MCP tool. Only the registered tools are wrapped,
+    so calls between tools inside the server (e.g. recomputing an expired case set) aren't counted.
+    The work of a call is attributed to the query tag of its MCP request, if the client sent one.
+    """
+
+    @functools.wraps(tool)
+    async def instrumented(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        token = query_tag.set(get_request_query_tag())
+        try:
+            result = await tool(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            query_tag.reset(token)
+            tool_latency.observe(time.perf_counter() - start, tool.__name__)
+            tool_calls.inc(tool.__name__, status)
+
+    return instrumented
+
+
+def case_cache_metric(name: str, type: str, help: str, stat: str) -> CallbackMetric:
+    # reads `case_cache` at scrape time, since main may replace it
+    return CallbackMetric(
+        f"qag_mcp_case_cache_{name}", help, type, lambda: case_cache.stats()[stat]
+    )
+
+
+server_metrics = [
+    tool_calls,
+    tool_latency,
+    case_cache_metric("hits_total", "counter", "Case cache hits.", "hits"),
+    case_cache_metric(
+        "store_hits_total",
+        "counter",
+        "Case cache misses served from the persistent store.",
+        "store_hits",
+    ),
+    case_cache_metric("misses_total", "counter", "Case cache misses.", "misses"),
+    case_cache_metric(
+        "evictions_total",
+        "counter",
+        "Case sets evicted from the case cache to stay within its size.",
+        "evictions",
+    ),
+    case_cache_metric(
+        "expirations_total",
+        "counter",
+        "Case sets expired from the case cache.",
+        "expirations",
+    ),
+    case_cache_metric("entries", "gauge", "Case sets in the case cache.", "entries"),
+    case_cache_metric("bytes", "gauge", "Size of the case cache in bytes.", "bytes"),
+    case_cache_metric(
+        "max_bytes", "gauge", "Maximum size of the case cache in bytes.", "max_bytes"
+    ),
+    gdc_requests,
+    gdc_request_errors,
+    gdc_response_bytes,
+    gdc_query_pages,
+]
+
+
+async def get_server_metrics(request: Request) -> PlainTextResponse:
+    # not a tool, the same counters as /stats (and more) in the Prometheus text format for scraping
+    return PlainTextResponse(
+        render_metrics(server_metrics),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 if __name__ == "__main__":
@@ -404,8 +861,135 @@ if __name__ == "__main__":
         default=False,
         action="store_true",
     )
+    parser.add_argument(
+        "--gdc-api",
+        default=gdc_client_config.api_url,
+        help=(
+            "Base URL of the GDC API, by default the GDC_API environment variable or else the public GDC API. "
+            "Point this at a local stand-in (see benchmarks/mock_gdc.py) to run without network access."
+        ),
+    )
+    parser.add_argument(
+        "--gdc-pool-maxsize",
+        type=int,
+        default=16,
+        help=(
+            "Maximum number of pooled connections kept open for GDC API requests, "
+            "further requests wait for a free connection."
+        ),
+    )
+    parser.add_argument(
+        "--no-gdc-keep-alive",
+        dest="gdc_keep_alive",
+        default=True,
+        action="store_false",
+        help="Disable HTTP keep-alive for GDC API requests (every request opens a new connection).",
+    )
+    parser.add_argument(
+        "--gdc-max-workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of pages of a GDC API retrieval to fetch concurrently after the first page. "
+            "Keep this at or below --gdc-pool-maxsize so that concurrent pages reuse pooled connections."
+        ),
+    )
+    parser.add_argument(
+        "--gdc-timeout",
+        type=float,
+        default=None,
+        help="Seconds to wait on a GDC API request before failing, by default waits indefinitely.",
+    )
+    parser.add_argument(
+        "--gdc-max-in-values",
+        type=int,
+        default=1000,
+        help="Split GDC API `in` filters with more values than this into chunks that are queried concurrently.",
+    )
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument(
+        "--gdc-record",
+        default=None,
+        metavar="ARCHIVE",
+        help="Record every GDC API response to this compressed archive, e.g. `gdc.jsonl.gz`.",
+    )
+    recording.add_argument(
+        "--gdc-replay",
+        default=None,
+        metavar="ARCHIVE",
+        help=(
+            "Serve GDC API responses from an archive recorded with --gdc-record instead of the GDC API, "
+            "for deterministic performance runs without network access."
+        ),
+    )
+    parser.add_argument(
+        "--gdc-replay-latency",
+        type=float,
+        default=0.0,
+        help="Seconds of simulated latency per replayed GDC API response.",
+    )
+    parser.add_argument(
+        "--case-cache-max-bytes",
+        type=int,
+        default=256 * 1024**2,
+        help="Memory budget in bytes for cached case sets, least recently used sets are evicted beyond it.",
+    )
+    parser.add_argument(
+        "--case-cache-ttl",
+        type=float,
+        default=3600,
+        help="Seconds a cached case set is kept after it was last used.",
+    )
+    parser.add_argument(
+        "--case-store",
+        default=None,
+        help=(
+            "Path to a SQLite file persisting case sets across server restarts. "
+            "Server workers on the same node pointed at the same file share their case sets. "
+            "By default case sets are only cached in memory by each server process."
+        ),
+    )
+    parser.add_argument(
+        "--compact-case-set-ids",
+        type=int,
+        default=None,
+        metavar="LENGTH",
+        help=(
+            "Return short hashed handles instead of case set IDs longer than LENGTH characters, "
+            "e.g. for deeply nested set operations, to save LLM context. "
+            "By default full case set IDs are always returned."
+        ),
+    )
     args = parser.parse_args()
 
+    # all workers of a node can share case sets by pointing at the same store
+    store = None
+    if args.case_store is not None:
+        store = SQLiteCaseSetStore(args.case_store, ttl=args.case_cache_ttl)
+    case_cache = CaseCache(
+        max_bytes=args.case_cache_max_bytes, ttl=args.case_cache_ttl, store=store
+    )
+    case_queries = CaseQueryCache(maxsize=1000, ttl=args.case_cache_ttl, store=store)
+    case_expressions = TTLCache(maxsize=10000, ttl=args.case_cache_ttl)
+    case_set_lineage = CaseSetLineage(maxsize=100000, store=store)
+    compact_case_set_id_length = args.compact_case_set_ids
+    case_counts = TTLCache(maxsize=1000, ttl=args.case_cache_ttl)
+
+    configure_gdc_client(
+        api_url=args.gdc_api,
+        pool_maxsize=args.gdc_pool_maxsize,
+        keep_alive=args.gdc_keep_alive,
+        max_workers=args.gdc_max_workers,
+        timeout=args.gdc_timeout,
+        max_in_values=args.gdc_max_in_values,
+    )
+    if args.gdc_record is not None:
+        configure_gdc_recording(args.gdc_record, "record")
+    elif args.gdc_replay is not None:
+        configure_gdc_recording(
+            args.gdc_replay, "replay", latency=args.gdc_replay_latency
+        )
+
     mcp = FastMCP(
         name="GDC API MCP Server",
         instructions=(
@@ -421,19 +1005,31 @@ if __name__ == "__main__":
         port=args.port,
     )
 
-    mcp.add_tool(get_simple_somatic_mutation_occurrences)
-    mcp.add_tool(get_copy_number_variant_occurrences)
-    mcp.add_tool(get_microsatellite_instability_occurrences)
+    mcp.custom_route("/stats", methods=["GET"])(get_server_stats)
+    mcp.custom_route("/metrics", methods=["GET"])(get_server_metrics)
+
+    def add_tool(tool):
+        mcp.add_tool(instrument_tool(tool))
+
+    add_tool(get_simple_somatic_mutation_occurrences)
+    add_tool(get_copy_number_variant_occurrences)
+    add_tool(get_microsatellite_instability_occurrences)
     if args.use_cohort_copilot:
         # NOTE: with cohort copilot v1, importing will load a model onto GPU so defer until needed
         from .cohort_copilot import generate_filter
 
         get_cases_by_cohort_description = make_cohort_copilot_tool(generate_filter)
-        mcp.add_tool(get_cases_by_cohort_description)
+        add_tool(get_cases_by_cohort_description)
     else:
-        mcp.add_tool(get_cases_by_project)
-    mcp.add_tool(compute_case_intersection)
-    mcp.add_tool(compute_case_union)
-    mcp.add_tool(get_case_set_size)
-
-    mcp.run(transport=args.transport)
+        add_tool(get_cases_by_project)
+    add_tool(compute_case_intersection)
+    add_tool(compute_case_union)
+    add_tool(compute_multi_case_intersection)
+    add_tool(compute_multi_case_union)
+    add_tool(get_case_set_size)
+
+    try:
+        mcp.run(transport=args.transport)
+    finally:
+        # writes the end of the compressed archive
+        configure_gdc_recording(None)
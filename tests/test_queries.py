@@ -0,0 +1,46 @@
+from qag_mcp._queries import CaseQuery, intersect_case_queries
+
+SSM = CaseQuery(
+    endpoint="ssm_occurrences",
+    filters={
+        "op": "in",
+        "content": {"field": "ssm.gene_aa_change", "value": ["BRAF V600E"]},
+    },
+    case_id_field="case.case_id",
+)
+
+
+def cases(field: str, value: str) -> CaseQuery:
+    return CaseQuery(
+        endpoint="cases",
+        filters={
+            "op": "and",
+            "content": [{"op": "in", "content": {"field": field, "value": [value]}}],
+        },
+        case_id_field="case_id",
+    )
+
+
+def test_intersect_pushes_down_nested_case_fields():
+    query = intersect_case_queries(cases("cases.project.project_id", "TCGA-SKCM"), SSM)
+    assert query.endpoint == "ssm_occurrences"
+    assert query.filters["content"][0] == SSM.filters
+    case_filter = query.filters["content"][1]["content"][0]["content"]
+    assert case_filter["field"] == "case.project.project_id"
+
+
+def test_intersect_keeps_fields_missing_from_the_endpoint_in_memory():
+    # e.g. from cohort copilot, occurrences don't nest the files of their case
+    assert intersect_case_queries(cases("files.data_format", "BAM"), SSM) is None
+    assert intersect_case_queries(SSM, cases("files.data_format", "BAM")) is None
+
+
+def test_intersect_cases_with_cases():
+    query = intersect_case_queries(
+        cases("files.data_format", "BAM"),
+        cases("cases.project.project_id", "TCGA-SKCM"),
+    )
+    assert query.endpoint == "cases"
+    fields = [f["content"][0]["content"]["field"] for f in query.filters["content"]]
+    # only the second query is rebased, both field paths are valid on the cases endpoint
+    assert fields == ["files.data_format", "cases.project.project_id"]
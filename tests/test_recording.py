@@ -0,0 +1,29 @@
+import asyncio
+
+from qag_mcp._recording import GDCRecording
+
+
+def test_resume_killed_recording(tmp_path):
+    path = tmp_path / "gdc.jsonl.gz"
+    recording = GDCRecording(str(path), "record")
+    for i in range(100):
+        recording.record("cases", {"from": i}, {"data": {"hits": [i]}})
+    # killing the server leaves the archive without the end of its gzip stream, and maybe cut off mid response
+    killed = path.read_bytes()[:-20]
+    recording.close()
+    path.write_bytes(killed)
+
+    recording = GDCRecording(str(path), "record")
+    recovered = recording.stats()["entries"]
+    assert recovered > 0
+    recording.record("cases", {"from": -1}, {"data": {"hits": []}})
+    recording.close()
+
+    recording = GDCRecording(str(path), "replay")
+    assert recording.stats()["entries"] == recovered + 1
+    assert asyncio.run(recording.replay_async("cases", {"from": 0})) == {
+        "data": {"hits": [0]}
+    }
+    assert asyncio.run(recording.replay_async("cases", {"from": -1})) == {
+        "data": {"hits": []}
+    }
@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+from cachetools import TTLCache
+
+from benchmarks.mock_gdc import MockGDC, start_mock_gdc
+from benchmarks.synthetic_gdc import generate_dataset
+from qag_mcp import server
+from qag_mcp._cache import CaseCache, CaseQueryCache, CaseSetLineage
+from qag_mcp._metrics import query_counters, query_tag
+from qag_mcp._utils import configure_gdc_client
+
+
+@pytest.fixture(scope="module")
+def mock_gdc():
+    url = start_mock_gdc(MockGDC(generate_dataset(n_cases=2000, n_genes=20)))
+    configure_gdc_client(api_url=url)
+    return url
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(mock_gdc):
+    server.case_cache = CaseCache(max_bytes=256 * 1024**2, ttl=3600)
+    server.case_queries = CaseQueryCache(maxsize=1000, ttl=3600)
+    server.case_counts = TTLCache(maxsize=1000, ttl=3600)
+    server.case_expressions = TTLCache(maxsize=10000, ttl=3600)
+    server.case_set_lineage = CaseSetLineage(maxsize=100000)
+
+
+def test_set_operation_on_operand_in_reverse_order():
+    ssm = "Cases-SSM-(TP53)-(None)"
+    project = "Cases-Project-(TCGA-BRCA)"
+    # not the canonical order, which sorts the operands
+    intersection = f"Cases-Intersect-({ssm})-({project})"
+
+    async def run():
+        cnv = await server.get_copy_number_variant_occurrences("KRAS")
+        union = await server.compute_case_union(intersection, cnv)
+        size = await server.get_case_set_size(union)
+
+        _, operands = server.case_expressions[union]
+        assert server.canonicalize_case_set_id(intersection) in operands
+        assert intersection not in operands
+
+        # the same union over the canonical operand, starting from empty caches
+        server.case_cache.clear()
+        server.case_queries.clear()
+        server.case_counts.clear()
+        server.case_expressions.clear()
+        canonical = await server.compute_case_intersection(project, ssm)
+        assert canonical == server.canonicalize_case_set_id(intersection)
+        assert await server.compute_case_union(canonical, cnv) == union
+        assert await server.get_case_set_size(union) == size
+
+    asyncio.run(run())
+
+
+def test_multi_set_operation_on_operand_in_reverse_order():
+    ssm = "Cases-SSM-(TP53)-(None)"
+    project = "Cases-Project-(TCGA-BRCA)"
+
+    async def run():
+        msi = await server.get_microsatellite_instability_occurrences("mss")
+        union = await server.compute_multi_case_union(
+            [f"Cases-Intersect-({ssm})-({project})", msi]
+        )
+        size = await server.get_case_set_size(union)
+        intersection = await server.compute_case_intersection(project, ssm)
+        assert await server.compute_case_union(msi, intersection) == union
+        assert await server.get_case_set_size(union) == size
+
+    asyncio.run(run())
+
+
+def test_intersection_with_unnested_case_fields():
+    def generate_filter(cohort_description: str) -> str:
+        # as cohort copilot might, on a files field that occurrences don't nest
+        return json.dumps(
+            {
+                "op": "and",
+                "content": [
+                    {
+                        "op": "in",
+                        "content": {"field": "files.data_format", "value": ["BAM"]},
+                    }
+                ],
+            }
+        )
+
+    get_cases_by_cohort_description = server.make_cohort_copilot_tool(generate_filter)
+
+    async def run():
+        cohort = await get_cases_by_cohort_description("cases with BAM files")
+        ssm = await server.get_simple_somatic_mutation_occurrences("KRAS")
+        intersection = await server.compute_case_intersection(cohort, ssm)
+        size = await server.get_case_set_size(intersection)
+
+        expected = await server.get_case_set(cohort) & await server.get_case_set(ssm)
+        assert size == len(expected)
+
+    asyncio.run(run())
+
+
+def test_counters_by_query_tag():
+    async def run_query(tag: str, gene: str):
+        query_tag.set(tag)
+        ssm = await server.get_simple_somatic_mutation_occurrences(gene)
+        project = await server.get_cases_by_project("TCGA-BRCA")
+        intersection = await server.compute_case_intersection(ssm, project)
+        await server.get_case_set(intersection)
+        await server.get_case_set(intersection)
+
+    async def run():
+        # concurrent queries, each in its own task as with separate MCP sessions
+        await asyncio.gather(run_query("q1", "TP53"), run_query("q2", "KRAS"))
+
+    asyncio.run(run())
+    q1, q2 = query_counters.get("q1"), query_counters.get("q2")
+    assert q1["gdc_requests"] > 0 and q2["gdc_requests"] > 0
+    assert q1["case_cache_misses"] == q2["case_cache_misses"] == 1
+    assert q1["case_cache_hits"] == q2["case_cache_hits"] == 1
+    assert query_counters.get("q3") == {}
@@ -0,0 +1,34 @@
+import sqlite3
+import time
+
+from qag_mcp._case_sets import CaseSet
+from qag_mcp._store import SQLiteCaseSetStore
+
+
+def test_writes_dont_wait_on_other_workers(tmp_path):
+    path = str(tmp_path / "cases.sqlite")
+    store = SQLiteCaseSetStore(path, ttl=3600)
+    store.flush()
+    # another worker in the middle of a write
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+
+    start = time.perf_counter()
+    store.put("Cases-Project-(TCGA-BRCA)", CaseSet.from_case_ids(["a", "b"]))
+    assert time.perf_counter() - start < 1
+    # reads don't wait on the writer either
+    assert store.get("Cases-Project-(TCGA-LUAD)") is None
+
+    other.rollback()
+    store.flush()
+    case_set = SQLiteCaseSetStore(path, ttl=3600).get("Cases-Project-(TCGA-BRCA)")
+    assert sorted(case_set) == ["a", "b"]
+
+
+def test_touch_is_throttled(tmp_path):
+    store = SQLiteCaseSetStore(str(tmp_path / "cases.sqlite"), ttl=3600)
+    store.put("Cases-Project-(TCGA-BRCA)", CaseSet.from_case_ids(["a"]))
+    writes = store._writes
+    for _ in range(1000):
+        store.touch("Cases-Project-(TCGA-BRCA)")
+    assert store._writes == writes
@@ -0,0 +1,63 @@
+import pytest
+
+from qag_mcp._utils import case_set_id_matcher, split_in_filters
+
+
+def in_filter(field: str, values: list) -> dict:
+    return {"op": "in", "content": {"field": field, "value": values}}
+
+
+def test_split_in_filters_and():
+    filters = {
+        "op": "and",
+        "content": [in_filter("a", [1, 2, 3]), in_filter("b", [4, 5, 6])],
+    }
+    split = split_in_filters(filters, 2)
+    # every combination of chunks
+    assert [[f["content"]["value"] for f in s["content"]] for s in split] == [
+        [[1, 2], [4, 5]],
+        [[1, 2], [6]],
+        [[3], [4, 5]],
+        [[3], [6]],
+    ]
+
+
+def test_split_in_filters_or():
+    filters = {
+        "op": "or",
+        "content": [
+            in_filter("a", [1, 2, 3, 4, 5]),
+            in_filter("b", [6]),
+            in_filter("c", [7, 8, 9]),
+        ],
+    }
+    split = split_in_filters(filters, 2)
+    # the chunks are spread over the filters, and the disjunct that wasn't split is only queried once
+    assert [s["content"] for s in split] == [
+        [in_filter("a", [1, 2]), in_filter("b", [6]), in_filter("c", [7, 8])],
+        [in_filter("a", [3, 4]), in_filter("c", [9])],
+        [in_filter("a", [5])],
+    ]
+
+
+def test_split_in_filters_unsplit():
+    filters = {"op": "or", "content": [in_filter("a", [1]), in_filter("b", [2])]}
+    assert split_in_filters(filters, 2) == [filters]
+
+
+def test_match_case_set_id_nested():
+    cohort = "Cases-Cohort-(stage (I)-(II) tumors)"
+    union = f"Cases-Union-({cohort})-(Cases-SSM-(KRAS)-(None))"
+    assert case_set_id_matcher.match(
+        f"Cases-Intersect-({union})-(Cases-MSI-(msi))"
+    ) == (
+        "compute_case_intersection",
+        {"case_set_id_A": union, "case_set_id_B": "Cases-MSI-(msi)"},
+    )
+    with pytest.raises(IndexError):
+        case_set_id_matcher.match("Cases-Union-(Cases-MSI-(msi)-(Cases-MSI-(mss))")
+    # balanced, but closing a paren that was never opened
+    with pytest.raises(IndexError):
+        case_set_id_matcher.match("Cases-Cohort-(Cases-SSM-)-)-(Cases-SSM-()")
+    with pytest.raises(IndexError):
+        case_set_id_matcher.match("Cases-Cohort-(a)-b)-(c")